@@ -1,20 +1,34 @@
 import os
-import json
 import secrets
+import threading
 from flask import Flask
 from config import Config
 from .models import db, Show
+from .database import init_database
+from .schema import upgrade_schema, schema_is_current, mark_schema_current
 from .utils import init_utils
-from .logger import init_logger
+from .config_store import init_config_store
+from .stream_tap import init_stream_tap
+from .streams import init_streams
+from .silence import init_silence
+from .rolling_buffer import init_rolling_buffer
+from .recorder import init_recorder
+from .postprocess import init_postprocess
+from .catalog import init_catalog
+from .preview import init_preview, start_preview_workers
+from .retention import init_retention
+from .timeline import init_timeline
+from .metrics import init_metrics
+from .logger import init_logger, configure_logging
 from flask_migrate import Migrate
 from datetime import datetime, timedelta
-from .scheduler import init_scheduler, pause_shows_until
+from .scheduler import init_scheduler, start_scheduling, pause_shows_until, include_object
+from .leader import init_leader, elect
 
-def create_app(config_class=Config):
-    app = Flask(__name__)
+def create_app(config_class=Config, instance_path=None):
+    app = Flask(__name__, instance_path=instance_path)
     app.config.from_object(config_class)
     
-    user_config_path = os.path.join(app.instance_path, 'user_config.json')
     logs_dir = os.path.join(app.instance_path, 'logs')
     log_file_path = os.path.join(logs_dir, 'ShowRecorder.log')
     
@@ -27,82 +41,173 @@ def create_app(config_class=Config):
     initial_logger.info("Init logger initialized.")
 
 #Load/Generate secret key and user config
-    if not os.path.exists(user_config_path):
-        try:
-            with open(user_config_path, 'w') as f:
-                secret_key = secrets.token_hex(16)
-                default_config = {
-                    "SECRET_KEY": secret_key
-                }
-                json.dump(default_config, f, indent=4)
-                app.config['SECRET_KEY'] = secret_key
-        except Exception as e:
-            initial_logger.error(f"Error creating user config: {e}")
-    else:
-        try:
-            with open(user_config_path, 'r') as f:
-                user_config = json.load(f)
-                app.config.update(user_config)
-        except Exception as e:
-            initial_logger.error(f"Error loading user config: {e}")
+    try:
+        init_config_store(app, {
+            "SECRET_KEY": secrets.token_hex(16),
+            "PAUSE_SHOWS_RECORDING": False,
+            "PAUSE_SHOW_END_DATE": None,
+        })
+    except Exception as e:
+        initial_logger.error(f"Error loading user config: {e}")
+
+    try:
+        configure_logging(app.config)
+    except Exception as e:
+        initial_logger.error(f"Error configuring logging: {e}")
 
 #Init Database
     try:
-        db.init_app(app)
-        Migrate(app, db)
+        init_database(app)
+        Migrate(app, db, include_object=include_object)
 
         with app.app_context():
-            from flask_migrate import upgrade, init, migrate
-            migrations_dir = os.path.join(app.instance_path, 'migrations')
-            if not os.path.exists(migrations_dir):
-                try:
-                    init(directory=migrations_dir)
-                    migrate(message="Initial migration", directory=migrations_dir)
-                    upgrade(directory=migrations_dir)
-                except Exception as e:
-                    initial_logger.logger.error(f"Error during migrations: {e}")
+            if schema_is_current():
+                initial_logger.info("Database schema is current, skipping migrations.")
+            else:
+                from flask_migrate import upgrade, init, migrate
+                migrations_dir = os.path.join(app.instance_path, 'migrations')
+                if not os.path.exists(migrations_dir):
+                    try:
+                        init(directory=migrations_dir)
+                        migrate(message="Initial migration", directory=migrations_dir)
+                        upgrade(directory=migrations_dir)
+                    except Exception as e:
+                        initial_logger.error(f"Error during migrations: {e}")
+                    init_logger()
+                upgrade_schema(initial_logger)
+                db.create_all()
+                mark_schema_current()
     except Exception as e:
         initial_logger.error(f"Error initializing the database: {e}")
 
 #Delete past shows
     try:
         with app.app_context():
-            past_shows = Show.query.filter(Show.end_date < datetime.now().date()).all()
-            initial_logger.info(f"Past shows: {past_shows}")
-            if not past_shows:
+            deleted = Show.query.filter(Show.end_date < datetime.now().date()).delete(synchronize_session=False)
+            db.session.commit()
+            if not deleted:
                 initial_logger.info("No past shows to delete on Init.")
             else:
-                for show in past_shows:
-                    db.session.delete(show)
-                db.session.commit()
-                initial_logger.info(f"{past_shows} shows deleted on Init.")
+                initial_logger.info(f"{deleted} past shows deleted on Init.")
     except Exception as e:
         initial_logger.error(f"Error deleting past shows on Init: {e}")
 
-#Init Scheduler and Utils
+#Init Stream tap, Recorder, Scheduler and Utils
+    try:
+        init_stream_tap(app)
+    except Exception as e:
+        initial_logger.error(f"Error initializing stream tap: {e}")
+
+    try:
+        init_streams(app)
+    except Exception as e:
+        initial_logger.error(f"Error initializing streams: {e}")
+
+    try:
+        init_silence(app)
+    except Exception as e:
+        initial_logger.error(f"Error initializing silence detection: {e}")
+
+    try:
+        init_catalog(app)
+    except Exception as e:
+        initial_logger.error(f"Error initializing catalog: {e}")
+
+    try:
+        init_preview(app)
+    except Exception as e:
+        initial_logger.error(f"Error initializing previews: {e}")
+
+    try:
+        init_recorder(app)
+    except Exception as e:
+        initial_logger.error(f"Error initializing recorder: {e}")
+
+    try:
+        init_metrics(app)
+    except Exception as e:
+        initial_logger.error(f"Error initializing metrics: {e}")
+
     try:
         init_scheduler(app)
     except Exception as e:
         initial_logger.error(f"Error initializing scheduler: {e}")
 
+    try:
+        init_timeline(app)
+    except Exception as e:
+        initial_logger.error(f"Error initializing timeline: {e}")
+
     try:
         init_utils()
     except Exception as e:
         initial_logger.error(f"Error initializing utils: {e}")
 
+    from .routes import main_bp
+    from .api import api_bp
+    from .bulk import shows_cli
+    app.register_blueprint(main_bp)
+    app.register_blueprint(api_bp)
+    app.cli.add_command(shows_cli)
+
+#Elect the process that runs the scheduler and recorder
+    try:
+        init_leader(app)
+    except Exception as e:
+        initial_logger.error(f"Error initializing leader election: {e}")
+
+    if app.config['FAST_STARTUP']:
+        threading.Thread(target=_elect_leader, args=(app,), name="Leader startup", daemon=True).start()
+        initial_logger.info("Scheduler startup deferred to a background thread.")
+    else:
+        _elect_leader(app)
+
+    initial_logger.info("Application startup complete.")
+
+    return app
+
+def _elect_leader(app):
+    try:
+        elect(start_leader)
+    except Exception as e:
+        init_logger().error(f"Error electing scheduler leader: {e}")
+
+def start_leader(app):
+    """Start the parts of the app that must run in exactly one process."""
+
+    leader_logger = init_logger()
+
+    try:
+        init_rolling_buffer(app)
+    except Exception as e:
+        leader_logger.error(f"Error initializing rolling buffer: {e}")
+
+    try:
+        init_postprocess(app)
+    except Exception as e:
+        leader_logger.error(f"Error initializing post-processing: {e}")
+
+    try:
+        start_preview_workers(app)
+    except Exception as e:
+        leader_logger.error(f"Error starting preview workers: {e}")
+
+    try:
+        start_scheduling(app)
+    except Exception as e:
+        leader_logger.error(f"Error starting scheduler: {e}")
+
+    try:
+        init_retention(app)
+    except Exception as e:
+        leader_logger.error(f"Error initializing retention: {e}")
+
 #Init Show pausing restart roll over
     try:
         if app.config['PAUSE_SHOWS_RECORDING'] is True and app.config['PAUSE_SHOW_END_DATE'] is not None :
             pause_shows_until(app.config['PAUSE_SHOW_END_DATE'])
-            initial_logger.info(f"Shows paused on startup until {app.config['PAUSE_SHOW_END_DATE']}")
+            leader_logger.info(f"Shows paused on startup until {app.config['PAUSE_SHOW_END_DATE']}")
         else:
-            initial_logger.info("Shows not paused on startup.")
+            leader_logger.info("Shows not paused on startup.")
     except Exception as e:
-        initial_logger.error(f"Error pausing shows on Init: {e}")
-    
-    from .routes import main_bp
-    app.register_blueprint(main_bp)
-    
-    initial_logger.info("Application startup complete.")
-
-    return app
\ No newline at end of file
+        leader_logger.error(f"Error pausing shows on Init: {e}")
@@ -0,0 +1,166 @@
+from flask import Blueprint, request, session, current_app, jsonify, Response
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from functools import wraps
+from sqlalchemy import tuple_
+from .models import db, Show
+from .database import data_version
+from .bulk import show_row
+from .logger import init_logger
+from . import recorder, timeline, config_store, leader
+import threading
+import hashlib
+import base64
+import json
+
+API_VERSION = 1
+CACHE_SIZE = 256
+SHOW_ORDER = (Show.first_day, Show.start_time, Show.start_date, Show.id)
+
+CachedResponse = namedtuple('CachedResponse', ['token', 'body', 'etag'])
+
+api_bp = Blueprint('api', __name__, url_prefix=f'/api/v{API_VERSION}')
+logger = init_logger(name=__name__)
+logger.info("API logger initialized.")
+
+_responses = OrderedDict()
+_responses_lock = threading.Lock()
+
+def api_auth_required(f):
+	"""Allow logged-in admins, and clients presenting API_TOKEN as a bearer token."""
+
+	@wraps(f)
+	def decorated_function(*args, **kwargs):
+		token = current_app.config['API_TOKEN']
+		if not session.get('authenticated') and (token is None or request.headers.get('Authorization') != f"Bearer {token}"):
+			logger.warning(f"Unauthorized API request for {request.path}.")
+			return jsonify({'error': "Unauthorized."}), 401
+		return f(*args, **kwargs)
+	return decorated_function
+
+def cached_json(key, token, build):
+	"""Serve ``build()`` as JSON with a strong ETag, reusing the serialized body while ``token`` is unchanged.
+
+	``token`` stands for the data the body is built from (a change counter,
+	or the data itself when it is cheap to compare). Requests whose
+	If-None-Match matches get a bodiless 304.
+	"""
+
+	with _responses_lock:
+		entry = _responses.get(key)
+		if entry is not None and entry.token == token:
+			_responses.move_to_end(key)
+		else:
+			entry = None
+
+	if entry is None:
+		body = json.dumps(dict(build(), api_version=API_VERSION), separators=(',', ':')).encode()
+		entry = CachedResponse(token, body, hashlib.sha256(body).hexdigest()[:32])
+		with _responses_lock:
+			_responses[key] = entry
+			while len(_responses) > CACHE_SIZE:
+				_responses.popitem(last=False)
+
+	response = Response(entry.body, mimetype='application/json')
+	response.set_etag(entry.etag)
+	response.headers['Cache-Control'] = 'no-cache'
+	return response.make_conditional(request)
+
+def encode_cursor(show):
+	values = [show.first_day, show.start_time.isoformat(), show.start_date.isoformat(), show.id]
+	return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+	"""Return the sort key a cursor points after, raising ValueError if it is malformed."""
+
+	try:
+		first_day, start_time, start_date, show_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+		return (int(first_day), datetime.strptime(start_time, '%H:%M:%S').time(),
+				datetime.strptime(start_date, '%Y-%m-%d').date(), int(show_id))
+	except (TypeError, ValueError) as e:
+		raise ValueError(f"invalid cursor: {e}")
+
+def _error(message, status=400):
+	return jsonify({'error': message, 'api_version': API_VERSION}), status
+
+def _pause_state():
+	store = config_store.store
+	config = store.snapshot() if store is not None else current_app.config
+	return {'paused': bool(config.get('PAUSE_SHOWS_RECORDING')), 'until': config.get('PAUSE_SHOW_END_DATE')}
+
+def _active_recordings():
+	"""Active captures without their per-chunk counters, so the list only changes with their state."""
+
+	return [
+		{key: value for key, value in capture.to_dict().items() if key not in ('bytes_written', 'elapsed', 'dead_air')}
+		for capture in recorder.manager.active()
+	] if recorder.manager is not None else []
+
+@api_bp.route('/shows')
+@api_auth_required
+def shows():
+	"""List shows in airtime order, ``limit`` at a time, continuing after ``cursor``."""
+
+	limit = request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int)
+	if not 0 < limit <= current_app.config['API_MAX_PAGE_SIZE']:
+		return _error(f"limit must be between 1 and {current_app.config['API_MAX_PAGE_SIZE']}.")
+	cursor = request.args.get('cursor')
+	try:
+		after = decode_cursor(cursor) if cursor else None
+	except ValueError as e:
+		return _error(str(e))
+
+	def build():
+		query = Show.query.order_by(*SHOW_ORDER)
+		if after is not None:
+			query = query.filter(tuple_(*SHOW_ORDER) > tuple_(*after))
+		page = query.limit(limit + 1).all()
+		return {
+			'shows': [show_row(show) for show in page[:limit]],
+			'next_cursor': encode_cursor(page[limit - 1]) if len(page) > limit else None,
+		}
+
+	return cached_json(('shows', cursor, limit), data_version('shows'), build)
+
+@api_bp.route('/shows/<int:id>')
+@api_auth_required
+def show_detail(id):
+	"""Return one show."""
+
+	found = db.session.get(Show, id)
+	if found is None:
+		return _error("Show not found.", 404)
+	return cached_json(('show', id), data_version('shows'), lambda: {'show': show_row(found)})
+
+@api_bp.route('/schedule')
+@api_auth_required
+def schedule():
+	"""Return the upcoming recordings and whether recording is paused."""
+
+	occurrences = timeline.upcoming(days=request.args.get('days', type=int), limit=request.args.get('limit', type=int))
+	pause = _pause_state()
+	return cached_json(
+		('schedule', request.args.get('days'), request.args.get('limit')), (occurrences, pause),
+		lambda: dict(pause, occurrences=[timeline.to_dict(occurrence) for occurrence in occurrences])
+	)
+
+@api_bp.route('/pause')
+@api_auth_required
+def pause():
+	"""Return whether recording is paused, and until when."""
+
+	state = _pause_state()
+	return cached_json(('pause',), state, lambda: state)
+
+@api_bp.route('/recordings/active')
+@api_auth_required
+def active_recordings():
+	"""Return the captures running or queued on the scheduler leader."""
+
+	try:
+		active = leader.call('active_recordings')
+	except RuntimeError as e:
+		return _error(str(e), 503)
+	return cached_json(('recordings', 'active'), active, lambda: {'recordings': active})
+
+leader.register('active_recordings', _active_recordings)
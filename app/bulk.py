@@ -0,0 +1,244 @@
+from datetime import datetime
+from flask.cli import AppGroup
+from .models import db, Show, Stream
+from .show_index import get_index, apply_committed, validate_show
+import click
+import json
+import csv
+import io
+
+FIELDS = ['id', 'host_first_name', 'host_last_name', 'start_date', 'end_date', 'start_time', 'end_time', 'days_of_week', 'stream_id']
+OPTIONAL_FIELDS = {'stream_id'}
+BATCH_SIZE = 500
+JSON_CHUNK_SIZE = 65536
+
+shows_cli = AppGroup('shows', help="Bulk import and export of shows.")
+
+def iter_csv(stream):
+    """Yield rows from a binary CSV stream one at a time."""
+
+    yield from csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+
+def iter_json(stream):
+    """Yield objects from a binary stream holding a JSON array or JSON lines, without reading it all."""
+
+    decoder = json.JSONDecoder()
+    reader = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    buffer = ''
+    eof = False
+    started = False
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,]')
+        if buffer and not started:
+            # Only the outermost bracket opens the array; nested ones are rows.
+            started = True
+            if buffer[0] == '[':
+                buffer = buffer[1:]
+                continue
+        if buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                buffer = buffer[end:]
+                yield item
+                continue
+        elif eof:
+            return
+        chunk = reader.read(JSON_CHUNK_SIZE)
+        eof = not chunk
+        buffer += chunk
+
+def parse_row(row):
+    """Build an unsaved Show from an import row, raising ValueError on bad input.
+
+    An empty ``stream_id`` means the default stream; rows without the column
+    leave the stream of an updated show as it is.
+    """
+
+    if not isinstance(row, dict):
+        raise ValueError(f"expected an object, got {type(row).__name__}")
+    missing = [field for field in FIELDS[1:] if field not in OPTIONAL_FIELDS and not str(row.get(field) or '').strip()]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+
+    show = Show(
+        host_first_name=str(row['host_first_name']).strip(),
+        host_last_name=str(row['host_last_name']).strip(),
+        start_date=datetime.strptime(str(row['start_date']).strip(), '%Y-%m-%d').date(),
+        end_date=datetime.strptime(str(row['end_date']).strip(), '%Y-%m-%d').date(),
+        start_time=datetime.strptime(str(row['start_time']).strip()[:5], '%H:%M').time(),
+        end_time=datetime.strptime(str(row['end_time']).strip()[:5], '%H:%M').time(),
+        days_of_week=row['days_of_week'],
+    )
+    if row.get('id') not in (None, ''):
+        show.id = int(row['id'])
+    if str(row.get('stream_id') or '').strip():
+        show.stream_id = int(row['stream_id'])
+        if db.session.get(Stream, show.stream_id) is None:
+            raise ValueError(f"stream {show.stream_id} does not exist")
+    if show.end_date < show.start_date:
+        raise ValueError("end date is before start date")
+    if show.end_date < datetime.today().date():
+        raise ValueError("end date is in the past")
+    return show
+
+def _same_schedule(a, b):
+    return all(getattr(a, field) == getattr(b, field) for field in FIELDS[1:])
+
+def import_shows(rows, dry_run=False, skip_invalid=False):
+    """Validate and insert or update shows from ``rows`` in a single transaction.
+
+    Rows with an ``id`` update that show; other rows create a new show unless
+    an identical one already exists. Unless ``skip_invalid`` is set, any row
+    error aborts the whole import. The schedule is reconciled once at the
+    end. Returns a report dict with counts, per-row errors, and under
+    ``rows`` each row's action with its changed fields as ``[old, new]``.
+    """
+
+    from .scheduler import request_refresh
+
+    started = datetime.now()
+    index = get_index().copy()
+    existing = {}
+    for show in Show.query.yield_per(BATCH_SIZE):
+        existing.setdefault((show.host_first_name, show.host_last_name, show.days_of_week, show.start_time), []).append(show.id)
+
+    report = {'created': 0, 'updated': 0, 'unchanged': 0, 'errors': [], 'rows': [], 'dry_run': dry_run}
+    pending = []
+    for number, row in enumerate(rows, start=1):
+        try:
+            show = parse_row(row)
+            if show.id is not None:
+                current = db.session.get(Show, show.id)
+                if current is None:
+                    raise ValueError(f"show {show.id} does not exist")
+                if 'stream_id' not in row:
+                    show.stream_id = current.stream_id
+                if _same_schedule(show, current):
+                    report['unchanged'] += 1
+                    report['rows'].append({'row': number, 'id': show.id, 'action': 'unchanged', 'changes': {}})
+                    continue
+                old, new = show_row(current), show_row(show)
+                changes = {field: [old[field], new[field]] for field in FIELDS[1:] if old[field] != new[field]}
+                entry = {'row': number, 'id': show.id, 'action': 'update', 'changes': changes}
+            else:
+                key = (show.host_first_name, show.host_last_name, show.days_of_week, show.start_time)
+                if any(_same_schedule(show, db.session.get(Show, show_id)) for show_id in existing.get(key, [])):
+                    report['unchanged'] += 1
+                    report['rows'].append({'row': number, 'id': None, 'action': 'unchanged', 'changes': {}})
+                    continue
+                new = show_row(show)
+                entry = {'row': number, 'id': None, 'action': 'create', 'changes': {field: [None, new[field]] for field in FIELDS[1:]}}
+
+            errors, _ = validate_show(show, exclude_id=show.id, index=index)
+            if errors:
+                raise ValueError(' '.join(errors))
+            if show.id is None:
+                show.id = -number
+            index.add(show)
+            pending.append(show)
+            report['rows'].append(entry)
+        except (ValueError, TypeError, KeyError) as e:
+            report['errors'].append({'row': number, 'error': str(e)})
+            report['rows'].append({'row': number, 'id': None, 'action': 'error', 'error': str(e)})
+
+    if report['errors'] and not skip_invalid:
+        dry_run = True
+        report['aborted'] = True
+
+    try:
+        for start in range(0, len(pending), BATCH_SIZE):
+            for show in pending[start:start + BATCH_SIZE]:
+                if show.id > 0:
+                    current = db.session.get(Show, show.id)
+                    for field in FIELDS[1:]:
+                        setattr(current, field, getattr(show, field))
+                    report['updated'] += 1
+                else:
+                    show.id = None
+                    db.session.add(show)
+                    report['created'] += 1
+            db.session.flush()
+
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if not dry_run and pending:
+        def add_pending(shared):
+            for show in Show.query.filter(Show.id.in_([s.id for s in pending])).yield_per(BATCH_SIZE):
+                shared.add(show)
+        apply_committed(add_pending)
+        report['schedule'] = request_refresh()
+
+    report['elapsed_ms'] = round((datetime.now() - started).total_seconds() * 1000, 2)
+    return report
+
+def show_row(show):
+    return {
+        'id': show.id,
+        'host_first_name': show.host_first_name,
+        'host_last_name': show.host_last_name,
+        'start_date': show.start_date.isoformat(),
+        'end_date': show.end_date.isoformat(),
+        'start_time': show.start_time.strftime('%H:%M'),
+        'end_time': show.end_time.strftime('%H:%M'),
+        'days_of_week': show.days_of_week,
+        'stream_id': show.stream_id,
+    }
+
+def export_shows(fmt='csv'):
+    """Yield the Show table as CSV or JSON text, a batch of rows at a time."""
+
+    query = Show.query.order_by(Show.id).yield_per(BATCH_SIZE)
+    if fmt == 'json':
+        yield '['
+        for number, show in enumerate(query):
+            yield (',\n' if number else '\n') + json.dumps(show_row(show))
+        yield '\n]\n'
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+    writer.writeheader()
+    for show in query:
+        writer.writerow(show_row(show))
+        if buffer.tell() > JSON_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _format_for(filename, fmt=None):
+    if fmt:
+        return fmt
+    return 'json' if filename.lower().endswith(('.json', '.jsonl', '.ndjson')) else 'csv'
+
+@shows_cli.command('import')
+@click.argument('file', type=click.File('rb'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']), help="Defaults to the file extension.")
+@click.option('--dry-run', is_flag=True, help="Validate and report the changes without saving them.")
+@click.option('--skip-invalid', is_flag=True, help="Import the valid rows even if some rows have errors.")
+def import_command(file, fmt, dry_run, skip_invalid):
+    """Import shows from a CSV or JSON FILE."""
+
+    fmt = _format_for(file.name, fmt)
+    rows = iter_json(file) if fmt == 'json' else iter_csv(file)
+    report = import_shows(rows, dry_run=dry_run, skip_invalid=skip_invalid)
+    click.echo(json.dumps(report, indent=4, default=str))
+
+@shows_cli.command('export')
+@click.argument('file', type=click.File('w'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']), default=None, help="Defaults to the file extension, or csv.")
+def export_command(file, fmt):
+    """Export all shows to FILE (stdout by default)."""
+
+    for chunk in export_shows(_format_for(file.name, fmt)):
+        file.write(chunk)
@@ -0,0 +1,61 @@
+from datetime import date
+from .models import db, Show, Recording
+from .logger import init_logger
+from .mp3 import estimate_duration
+import hashlib
+import os
+
+CHUNK_SIZE = 1024 * 1024
+
+app = None
+logger = None
+
+def init_catalog(flask_app):
+    """Keep a reference to the app so finished captures can be catalogued from worker threads."""
+
+    global app, logger
+    logger = init_logger(name=__name__)
+    logger.info("Catalog logger initialized.")
+    app = flask_app
+
+def file_checksum(path):
+    """Return the SHA-256 hex digest of ``path``, read in chunks."""
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def catalog_file(path, show_id=None, air_date=None, dead_air=None):
+    """Insert or refresh the catalog row for the recording at ``path``.
+
+    ``dead_air`` is the seconds of silence detected while it was captured;
+    it is left alone when None, as when re-cataloguing after post-processing.
+    """
+
+    if app is None:
+        return None
+    try:
+        with app.app_context():
+            entry = Recording.query.filter_by(path=path).first()
+            if entry is None:
+                entry = Recording(path=path, show_id=show_id, air_date=air_date or date.today())
+                show = db.session.get(Show, show_id) if show_id else None
+                if show is not None:
+                    entry.host = f"{show.host_first_name} {show.host_last_name}"
+                db.session.add(entry)
+            elif show_id is not None and entry.show_id is None:
+                entry.show_id = show_id
+
+            entry.size = os.path.getsize(path)
+            entry.duration = estimate_duration(path)
+            entry.checksum = file_checksum(path)
+            if dead_air is not None:
+                entry.dead_air = dead_air
+            db.session.commit()
+            logger.info(f"Catalogued {path} ({entry.size} bytes).")
+            return entry.id
+    except Exception as e:
+        logger.error(f"Error cataloguing {path}: {e}")
+        return None
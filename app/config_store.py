@@ -0,0 +1,176 @@
+from .logger import init_logger
+import threading
+import tempfile
+import time
+import json
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CHECK_INTERVAL = 1.0
+
+logger = None
+store = None
+
+def init_config_store(app, defaults):
+    """Load the user config into ``app.config``, creating the file from ``defaults`` if needed."""
+
+    global logger, store
+    logger = init_logger(name=__name__)
+    logger.info("Config store logger initialized.")
+
+    store = ConfigStore(os.path.join(app.instance_path, 'user_config.json'), app.config)
+    store.load(defaults)
+    return store
+
+class ConfigStore:
+    """In-memory copy of user_config.json, kept in step with the file.
+
+    Reads come from memory; the file is stat()ed at most once every
+    CHECK_INTERVAL seconds to pick up changes made by other processes.
+    Writes go to a temporary file that is renamed over the original, under
+    an exclusive lock where the platform has one. Every change bumps
+    ``version`` and is mirrored into ``target`` (the Flask config) before
+    subscribers are notified with the changed keys.
+    """
+
+    def __init__(self, path, target=None):
+        self.path = path
+        self.version = 0
+        self._target = target
+        self._data = {}
+        self._stamp = None
+        self._checked = 0.0
+        self._lock = threading.RLock()
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """Call ``callback(changes)`` with a dict of changed keys after every change."""
+
+        self._subscribers.append(callback)
+
+    def get(self, key, default=None):
+        self.refresh()
+        return self._data.get(key, default)
+
+    def snapshot(self):
+        self.refresh()
+        return dict(self._data)
+
+    def load(self, defaults=None):
+        """Read the file, writing ``defaults`` for any keys it lacks."""
+
+        with self._lock, self._file_lock():
+            data = self._read()
+            missing = {key: value for key, value in (defaults or {}).items() if key not in data}
+            if missing or not os.path.exists(self.path):
+                data.update(missing)
+                self._write(data)
+            changes = self._apply(data)
+        self._notify(changes)
+
+    def refresh(self, force=False):
+        """Reload the file if another process changed it since the last check."""
+
+        now = time.monotonic()
+        if not force and now - self._checked < CHECK_INTERVAL:
+            return
+        self._checked = now
+        try:
+            if self._file_stamp() == self._stamp:
+                return
+        except OSError:
+            return
+        with self._lock:
+            try:
+                changes = self._apply(self._read())
+            except ValueError as e:
+                logger.error(f"Error reading user configuration: {e}")
+                return
+        if changes:
+            logger.info(f"User configuration reloaded, version {self.version}.")
+        self._notify(changes)
+
+    def update(self, updates):
+        """Merge ``updates`` into the file atomically and return the new version."""
+
+        with self._lock, self._file_lock():
+            data = self._read()
+            data.update(updates)
+            self._write(data)
+            changes = self._apply(data)
+            version = self.version
+        self._notify(changes)
+        logger.info(f"User configuration updated to version {version} with {updates}.")
+        return version
+
+    def _file_stamp(self):
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def _write(self, data):
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix='.user_config.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _apply(self, data):
+        """Swap in ``data`` and return the keys whose values changed."""
+
+        changes = {key: value for key, value in data.items() if key not in self._data or self._data[key] != value}
+        changes.update({key: None for key in self._data if key not in data})
+        self._data = data
+        self._stamp = self._file_stamp() if os.path.exists(self.path) else None
+        self._checked = time.monotonic()
+        if changes:
+            self.version += 1
+            if self._target is not None:
+                self._target.update(data)
+        return changes
+
+    def _notify(self, changes):
+        if not changes:
+            return
+        for callback in self._subscribers:
+            try:
+                callback(changes)
+            except Exception as e:
+                logger.error(f"Error notifying config subscriber {callback.__name__}: {e}")
+
+    def _file_lock(self):
+        return _FileLock(f"{self.path}.lock")
+
+class _FileLock:
+    """Exclusive advisory lock on ``path`` held for the duration of a with block."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._file = open(self.path, 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
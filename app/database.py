@@ -0,0 +1,116 @@
+from functools import wraps
+from flask import has_app_context
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from .models import db, Show, Stream, DataVersion
+import sqlite3
+
+app = None
+settings = {'wal': True, 'busy_timeout': 30}
+
+# Models whose changes bump a DataVersion counter, so readers such as the
+# JSON API can tell whether anything changed with a single indexed lookup.
+TRACKED = {Show: 'shows', Stream: 'streams'}
+
+def init_database(flask_app):
+    """Set up the database for concurrent request and scheduler threads.
+
+    SQLite connections get a busy timeout and a sized connection pool, and
+    switch the database to WAL so readers never block the single writer.
+    The app is kept for ``background_job``.
+    """
+
+    global app
+    app = flask_app
+
+    settings.update(wal=app.config['SQLITE_WAL'], busy_timeout=app.config['SQLITE_BUSY_TIMEOUT'])
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        options.setdefault('pool_size', app.config['SQLITE_POOL_SIZE'])
+        options.setdefault('max_overflow', app.config['SQLITE_POOL_OVERFLOW'])
+        options.setdefault('pool_timeout', settings['busy_timeout'])
+        options['connect_args'] = dict(options.get('connect_args') or {}, timeout=settings['busy_timeout'], check_same_thread=False)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    db.init_app(app)
+
+@event.listens_for(Engine, 'connect')
+def _configure_sqlite(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {int(settings['busy_timeout'] * 1000)}")
+    if settings['wal']:
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.close()
+
+def background_job(func):
+    """Run ``func`` in its own app context, and so its own session, unless one is active.
+
+    Scheduler and worker threads have no request to borrow a context from;
+    the session is removed, rolling back anything uncommitted, when the
+    context closes.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if has_app_context():
+            return func(*args, **kwargs)
+        with app.app_context():
+            return func(*args, **kwargs)
+    return wrapper
+
+def data_version(name, session=None):
+    """Return the change counter for ``name``, 0 if it never changed."""
+
+    return (session or db.session).execute(select(DataVersion.version).where(DataVersion.name == name)).scalar() or 0
+
+def committed_version(name):
+    """Return ``(before, after)`` of ``name``'s change counter across this session's last commit.
+
+    None if that commit did not change ``name``. A writer holds the database
+    lock from its first bump to its commit, so ``before`` is the version the
+    data had right before this session changed it.
+    """
+
+    return db.session.info.get('committed_versions', {}).get(name)
+
+def _bump(session, names):
+    connection = session.connection()
+    versions = session.info.setdefault('data_versions', {})
+    for name in names:
+        bumped = connection.execute(
+            update(DataVersion).where(DataVersion.name == name).values(version=DataVersion.version + 1)
+        ).rowcount
+        if not bumped:
+            connection.execute(insert(DataVersion).values(name=name, version=1))
+        version = connection.execute(select(DataVersion.version).where(DataVersion.name == name)).scalar()
+        versions[name] = (versions[name][0] if name in versions else version - 1, version)
+
+@event.listens_for(Session, 'after_flush')
+def _track_flush(session, flush_context):
+    changed = {
+        TRACKED[type(instance)]
+        for instance in (*session.new, *session.dirty, *session.deleted)
+        if type(instance) in TRACKED
+    }
+    if changed:
+        _bump(session, sorted(changed))
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk(orm_execute_state):
+    if orm_execute_state.is_select or orm_execute_state.bind_mapper is None:
+        return
+    name = TRACKED.get(orm_execute_state.bind_mapper.class_)
+    if name is not None:
+        _bump(orm_execute_state.session, [name])
+
+@event.listens_for(Session, 'after_commit')
+def _track_commit(session):
+    session.info['committed_versions'] = session.info.pop('data_versions', {})
+
+@event.listens_for(Session, 'after_rollback')
+def _track_rollback(session):
+    session.info.pop('data_versions', None)
@@ -0,0 +1,147 @@
+from .logger import init_logger
+import threading
+import socket
+import time
+import json
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCK_FILE = 'scheduler.lock'
+SOCKET_FILE = 'scheduler.sock'
+
+settings = {'enabled': True, 'retry_seconds': 2, 'timeout': 10}
+is_leader = False
+logger = None
+
+_app = None
+_lock_file = None
+_operations = {}
+
+def init_leader(app):
+    """Load the leader election settings from the app config."""
+
+    global logger, _app
+    logger = init_logger(name=__name__)
+    logger.info("Leader logger initialized.")
+    _app = app
+
+    settings.update(
+        enabled=app.config['SCHEDULER_LEADER_ELECTION'],
+        retry_seconds=app.config['SCHEDULER_LEADER_RETRY_SECONDS'],
+        timeout=app.config['SCHEDULER_CHANNEL_TIMEOUT'],
+    )
+
+def elect(on_elected):
+    """Elect one process to run the scheduler and recorder.
+
+    The process that holds an exclusive lock on ``instance/scheduler.lock``
+    is the leader: it calls ``on_elected(app)`` and serves operations on a
+    Unix socket. Every other process retries the lock every few seconds, so
+    the kernel releasing it when the leader dies triggers failover.
+    """
+
+    if not settings['enabled'] or fcntl is None or not hasattr(socket, 'AF_UNIX'):
+        logger.info("Leader election disabled, running the scheduler in this process.")
+        _become_leader(on_elected)
+        return
+
+    if _try_lock():
+        _become_leader(on_elected)
+    else:
+        logger.info(f"Process {os.getpid()} is a follower, watching for the scheduler lock.")
+        threading.Thread(target=_watch, args=(on_elected,), name="Leader watch", daemon=True).start()
+
+def register(name, func):
+    """Make ``func`` callable on the leader as operation ``name``."""
+
+    _operations[name] = func
+
+def call(name, *args):
+    """Run operation ``name`` on the leader and return its result.
+
+    Runs in-process on the leader. Followers send the call over the leader's
+    socket, retrying until the channel timeout so a call made during startup
+    or a failover waits for the leader.
+    """
+
+    deadline = time.monotonic() + settings['timeout']
+    while True:
+        if is_leader:
+            return _operations[name](*args)
+        try:
+            reply = _send({'op': name, 'args': list(args)})
+            break
+        except (FileNotFoundError, ConnectionRefusedError):
+            if time.monotonic() >= deadline:
+                raise RuntimeError("no scheduler leader is reachable")
+            time.sleep(0.5)
+
+    if 'error' in reply:
+        raise RuntimeError(reply['error'])
+    return reply.get('result')
+
+def _socket_path():
+    return os.path.join(_app.instance_path, SOCKET_FILE)
+
+def _try_lock():
+    global _lock_file
+    lock_file = open(os.path.join(_app.instance_path, LOCK_FILE), 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _lock_file = lock_file
+    return True
+
+def _watch(on_elected):
+    while not _try_lock():
+        time.sleep(settings['retry_seconds'])
+    _become_leader(on_elected)
+
+def _become_leader(on_elected):
+    global is_leader
+    is_leader = True
+    logger.info(f"Process {os.getpid()} elected scheduler leader.")
+    if _lock_file is not None:
+        _serve()
+    on_elected(_app)
+
+def _serve():
+    path = _socket_path()
+    if os.path.exists(path):
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    threading.Thread(target=_accept, args=(server,), name="Leader channel", daemon=True).start()
+
+def _accept(server):
+    while True:
+        connection, _ = server.accept()
+        threading.Thread(target=_handle, args=(connection,), name="Leader call", daemon=True).start()
+
+def _handle(connection):
+    with connection, connection.makefile('rwb') as stream:
+        try:
+            request = json.loads(stream.readline())
+            with _app.app_context():
+                reply = {'result': _operations[request['op']](*request['args'])}
+        except Exception as e:
+            logger.error(f"Error running leader operation: {e}")
+            reply = {'error': str(e)}
+        stream.write(json.dumps(reply, default=str).encode() + b'\n')
+        stream.flush()
+
+def _send(message):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(settings['timeout'])
+        connection.connect(_socket_path())
+        with connection.makefile('rwb') as stream:
+            stream.write(json.dumps(message).encode() + b'\n')
+            stream.flush()
+            return json.loads(stream.readline())
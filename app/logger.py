@@ -1,17 +1,84 @@
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from datetime import datetime
+import atexit
+import queue
+import json
 
-def init_logger(log_file_path=None):
-    logger = logging.getLogger(name='ShowRecorder')
+LOGGER_NAME = 'ShowRecorder'
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+FIELDS = ('show_id', 'job_id', 'recording_id', 'file', 'duration', 'start_offset')
 
-    if not any(isinstance(handler, RotatingFileHandler) for handler in logger.handlers):
+_listener = None
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including any structured fields."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for field in FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def init_logger(log_file_path=None, name=None):
+    """Return the app logger, or its child for module ``name``.
+
+    The first call with ``log_file_path`` attaches a QueueHandler to the
+    ShowRecorder logger and starts one QueueListener thread that owns the
+    rotating file handler, so callers never wait on disk I/O or rollover.
+    """
+
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+
+    if _listener is None and log_file_path is not None:
         handler = RotatingFileHandler(log_file_path, maxBytes=1024*1024*5, backupCount=5)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        log_queue = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        logger.addHandler(QueueHandler(log_queue))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    # Alembic's fileConfig() disables every logger that exists when migrations run.
+    for existing in [logger] + [logging.getLogger(key) for key in logging.root.manager.loggerDict if key.startswith(f"{LOGGER_NAME}.")]:
+        existing.disabled = False
+
+    if name is None:
+        return logger
+    child = logger.getChild(name.rsplit('.', 1)[-1])
+    child.disabled = False
+    return child
+
+def configure_logging(config):
+    """Apply LOG_FORMAT and the per-module LOG_LEVELS from the app config."""
+
+    if _listener is not None:
+        formatter = JsonFormatter() if config.get('LOG_FORMAT') == 'json' else logging.Formatter(TEXT_FORMAT)
+        for handler in _listener.handlers:
+            handler.setFormatter(formatter)
 
-    logger.setLevel(logging.INFO)
-    logger.propagate = False
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(config.get('LOG_LEVEL', 'INFO'))
+    for module, level in (config.get('LOG_LEVELS') or {}).items():
+        logger.getChild(module).setLevel(level)
 
-    return logger
+def shutdown_logging():
+    """Write out any queued records and stop the writer thread."""
 
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
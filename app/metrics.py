@@ -0,0 +1,224 @@
+from apscheduler.events import (EVENT_JOB_SUBMITTED, EVENT_JOB_MISSED, EVENT_JOB_ERROR, EVENT_JOB_MAX_INSTANCES,
+                                EVENT_JOB_ADDED, EVENT_JOB_MODIFIED, EVENT_SCHEDULER_RESUMED)
+from datetime import datetime, timedelta
+from .logger import init_logger
+from . import stream_tap, recorder, postprocess, silence, leader, streams as mounts, scheduler as schedule
+import threading
+import shutil
+
+LAG_BUCKETS = (0.1, 0.5, 1, 5, 15, 60, 300)
+MAX_COALESCED = 10000
+
+logger = None
+_output_folder = None
+_lock = threading.Lock()
+
+# Event-driven counters, each keyed by a tuple of label values. They change
+# a handful of times per show airing, so one lock is plenty; per-chunk
+# figures such as bytes written are read from the recorder at scrape time.
+_counters = {
+    'jobs_submitted': {},
+    'jobs_missed': {},
+    'jobs_coalesced': {},
+    'jobs_errored': {},
+    'ffmpeg_exits': {},
+    'captures': {},
+    'dead_air': {},
+}
+_lag = {'buckets': [0] * len(LAG_BUCKETS), 'sum': 0.0, 'count': 0}
+_refresh = {'last': None, 'sum': 0.0, 'count': 0}
+
+# Next run time of each job as last seen. APScheduler hands coalesced jobs
+# only their latest run time, so the runs folded into it are counted from
+# here instead.
+_expected = {}
+
+def init_metrics(app):
+    """Register the scheduler listeners that feed the metrics."""
+
+    global logger, _output_folder
+    logger = init_logger(name=__name__)
+    logger.info("Metrics logger initialized.")
+
+    _output_folder = app.config['OUTPUT_FOLDER']
+    schedule.scheduler.add_listener(_on_resumed, EVENT_SCHEDULER_RESUMED)
+    schedule.scheduler.add_listener(_on_changed, EVENT_JOB_ADDED | EVENT_JOB_MODIFIED)
+    schedule.scheduler.add_listener(_on_submitted, EVENT_JOB_SUBMITTED)
+    schedule.scheduler.add_listener(_on_missed, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+    schedule.scheduler.add_listener(_on_error, EVENT_JOB_ERROR)
+
+def _job_kind(job_id):
+    return job_id.split('_show_')[0] if '_show_' in job_id else job_id
+
+def increment(name, *labels, amount=1):
+    """Add ``amount`` to a counter."""
+
+    with _lock:
+        counter = _counters[name]
+        counter[labels] = counter.get(labels, 0) + amount
+
+def _on_submitted(event):
+    now = datetime.now(event.scheduled_run_times[-1].tzinfo)
+    lag = max((now - event.scheduled_run_times[-1]).total_seconds(), 0.0)
+    kind = _job_kind(event.job_id)
+    with _lock:
+        for index, bound in enumerate(LAG_BUCKETS):
+            if lag <= bound:
+                _lag['buckets'][index] += 1
+        _lag['sum'] += lag
+        _lag['count'] += 1
+    increment('jobs_submitted', kind)
+    coalesced = len(event.scheduled_run_times) - 1
+    job = schedule.scheduler.get_job(event.job_id)
+    if not coalesced and job is not None:
+        coalesced = _skipped_runs(job.trigger, _expected.get(event.job_id), event.scheduled_run_times[-1])
+    if coalesced:
+        increment('jobs_coalesced', kind, amount=coalesced)
+    _remember(event.job_id, job)
+
+def _skipped_runs(trigger, expected, run_time):
+    """Count the fire times from ``expected`` up to (not including) ``run_time``."""
+
+    count = 0
+    fire_time = expected
+    while fire_time is not None and fire_time < run_time and count < MAX_COALESCED:
+        count += 1
+        fire_time = trigger.get_next_fire_time(fire_time, fire_time + timedelta(microseconds=1))
+    return count
+
+def _remember(job_id, job):
+    if job is None or job.next_run_time is None:
+        _expected.pop(job_id, None)
+    else:
+        _expected[job_id] = job.next_run_time
+
+def _on_resumed(event):
+    _expected.clear()
+    for job in schedule.scheduler.get_jobs():
+        _remember(job.id, job)
+
+def _on_changed(event):
+    _remember(event.job_id, schedule.scheduler.get_job(event.job_id))
+
+def _on_missed(event):
+    increment('jobs_missed', _job_kind(event.job_id))
+
+def _on_error(event):
+    increment('jobs_errored', _job_kind(event.job_id))
+
+def observe_refresh(seconds):
+    """Record the duration of one refresh_schedule() run."""
+
+    with _lock:
+        _refresh['last'] = seconds
+        _refresh['sum'] += seconds
+        _refresh['count'] += 1
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _sample(name, value, **labels):
+    if labels:
+        rendered = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+        return f"{name}{{{rendered}}} {value}"
+    return f"{name} {value}"
+
+def _family(lines, name, kind, help_text):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+def _counter_family(lines, name, counter, help_text, *label_names):
+    _family(lines, name, 'counter', help_text)
+    for labels, value in sorted(counter.items()):
+        lines.append(_sample(name, value, **dict(zip(label_names, labels))))
+
+def render():
+    """Return all metrics in the Prometheus text exposition format."""
+
+    with _lock:
+        counters = {name: dict(counter) for name, counter in _counters.items()}
+        lag = {'buckets': list(_lag['buckets']), 'sum': _lag['sum'], 'count': _lag['count']}
+        refresh = dict(_refresh)
+
+    lines = []
+    _counter_family(lines, 'showrecorder_jobs_submitted_total', counters['jobs_submitted'], 'Scheduler jobs submitted for execution.', 'kind')
+    _counter_family(lines, 'showrecorder_jobs_missed_total', counters['jobs_missed'], 'Scheduler jobs that missed their run time.', 'kind')
+    _counter_family(lines, 'showrecorder_jobs_coalesced_total', counters['jobs_coalesced'], 'Scheduler runs merged into a later run.', 'kind')
+    _counter_family(lines, 'showrecorder_jobs_errored_total', counters['jobs_errored'], 'Scheduler jobs that raised an exception.', 'kind')
+
+    _family(lines, 'showrecorder_job_fire_lag_seconds', 'histogram', 'Delay between a job\'s scheduled and actual start.')
+    for bound, count in zip(LAG_BUCKETS, lag['buckets']):
+        lines.append(_sample('showrecorder_job_fire_lag_seconds_bucket', count, le=bound))
+    lines.append(_sample('showrecorder_job_fire_lag_seconds_bucket', lag['count'], le='+Inf'))
+    lines.append(_sample('showrecorder_job_fire_lag_seconds_sum', round(lag['sum'], 6)))
+    lines.append(_sample('showrecorder_job_fire_lag_seconds_count', lag['count']))
+
+    _family(lines, 'showrecorder_refresh_schedule_seconds', 'summary', 'Duration of schedule reconciliations.')
+    lines.append(_sample('showrecorder_refresh_schedule_seconds_sum', round(refresh['sum'], 6)))
+    lines.append(_sample('showrecorder_refresh_schedule_seconds_count', refresh['count']))
+    if refresh['last'] is not None:
+        _family(lines, 'showrecorder_refresh_schedule_last_seconds', 'gauge', 'Duration of the latest schedule reconciliation.')
+        lines.append(_sample('showrecorder_refresh_schedule_last_seconds', round(refresh['last'], 6)))
+
+    _counter_family(lines, 'showrecorder_captures_total', counters['captures'], 'Finished captures by mode and final state.', 'mode', 'state')
+    _counter_family(lines, 'showrecorder_ffmpeg_exits_total', counters['ffmpeg_exits'], 'FFmpeg capture exits by exit code.', 'code')
+
+    if recorder.manager is not None:
+        active = recorder.manager.active()
+        _family(lines, 'showrecorder_active_captures', 'gauge', 'Captures currently queued or running.')
+        lines.append(_sample('showrecorder_active_captures', len(active)))
+        _family(lines, 'showrecorder_capture_bytes', 'gauge', 'Bytes written by each active capture.')
+        rates = []
+        for capture in active:
+            written = capture.bytes_written
+            labels = {'id': capture.id, 'mode': capture.mode, 'file': capture.output_file}
+            lines.append(_sample('showrecorder_capture_bytes', written, **labels))
+            if capture.elapsed:
+                rates.append(_sample('showrecorder_capture_bytes_per_second', round(written / capture.elapsed, 1), **labels))
+        _family(lines, 'showrecorder_capture_bytes_per_second', 'gauge', 'Average write rate of each active capture.')
+        lines.extend(rates)
+
+        states = mounts.status(active)
+        _family(lines, 'showrecorder_stream_active_captures', 'gauge', 'Captures holding a slot per configured stream.')
+        for state in states:
+            lines.append(_sample('showrecorder_stream_active_captures', state['active'], stream=state['name']))
+        _family(lines, 'showrecorder_stream_health', 'gauge', 'Health of each configured stream, 1 for its current state.')
+        for state in states:
+            for health in ('ok', 'degraded', 'down'):
+                lines.append(_sample('showrecorder_stream_health', int(state['health'] == health), stream=state['name'], state=health))
+        _family(lines, 'showrecorder_stream_consecutive_failures', 'gauge', 'Failed captures in a row per configured stream.')
+        for state in states:
+            lines.append(_sample('showrecorder_stream_consecutive_failures', state['failures'], stream=state['name']))
+
+    with stream_tap._taps_lock:
+        taps = list(stream_tap._taps.values())
+    _family(lines, 'showrecorder_stream_tap_bytes_total', 'counter', 'Bytes read from the stream by each shared tap.')
+    for tap in taps:
+        lines.append(_sample('showrecorder_stream_tap_bytes_total', tap.bytes_read, url=tap.url))
+
+    _counter_family(lines, 'showrecorder_dead_air_events_total', counters['dead_air'], 'Dead air alerts raised per stream.', 'url')
+    streams = silence.status()['streams']
+    if streams:
+        _family(lines, 'showrecorder_stream_rms_dbfs', 'gauge', 'RMS level of the latest analysis window per stream.')
+        for stream in streams:
+            if stream['rms_db'] is not None:
+                lines.append(_sample('showrecorder_stream_rms_dbfs', stream['rms_db'], url=stream['url']))
+        _family(lines, 'showrecorder_stream_dead_air', 'gauge', 'Whether each analyzed stream is currently in dead air.')
+        for stream in streams:
+            lines.append(_sample('showrecorder_stream_dead_air', int(stream['dead_air_since'] is not None), url=stream['url']))
+
+    if postprocess.processor is not None:
+        _family(lines, 'showrecorder_postprocess_queue_depth', 'gauge', 'Recordings waiting for post-processing.')
+        lines.append(_sample('showrecorder_postprocess_queue_depth', postprocess.processor.queue_depth))
+
+    if _output_folder is not None:
+        try:
+            free = shutil.disk_usage(_output_folder).free
+            _family(lines, 'showrecorder_output_free_bytes', 'gauge', 'Free disk space in the output folder.')
+            lines.append(_sample('showrecorder_output_free_bytes', free))
+        except OSError as e:
+            logger.error(f"Error reading free space of {_output_folder}: {e}")
+
+    return '\n'.join(lines) + '\n'
+
+leader.register('metrics', render)
@@ -1,8 +1,46 @@
 from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime
 
 db = SQLAlchemy()
 
+DAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+def parse_days(value):
+	"""Parse weekdays such as 'Monday', 'mon,wed,fri', 'mon-fri' or a list of names into a bitmask."""
+
+	if isinstance(value, str):
+		value = value.replace(';', ',').replace('|', ',').replace(' ', ',').split(',')
+
+	mask = 0
+	for part in filter(None, (str(item).strip().lower() for item in value)):
+		bounds = [DAYS.index(day[:3]) if day[:3] in DAYS else None for day in part.split('-', 1)]
+		if None in bounds:
+			raise ValueError(f"unknown day {part!r}")
+		first, last = bounds[0], bounds[-1]
+		for day in range(first, (last if last >= first else last + 7) + 1):
+			mask |= 1 << (day % 7)
+	if not mask:
+		raise ValueError("no days selected")
+	return mask
+
+def mask_days(mask):
+	"""Return the day abbreviations set in a weekday bitmask, Monday first."""
+
+	return [day for bit, day in enumerate(DAYS) if mask & (1 << bit)]
+
+class Stream(db.Model):
+	"""A mount shows can record from; shows without one use STREAM_URL."""
+
+	id = db.Column(db.Integer, primary_key=True)
+	name = db.Column(db.String(50), nullable=False, unique=True)
+	url = db.Column(db.String(500), nullable=False)
+	bitrate = db.Column(db.Integer, nullable=True)
+	max_concurrent = db.Column(db.Integer, nullable=True)
+
 class Show(db.Model):
+	__table_args__ = (db.Index('ix_show_first_day_start', 'first_day', 'start_time', 'start_date'),)
+
 	id = db.Column(db.Integer, primary_key=True)
 	host_first_name = db.Column(db.String(50), nullable=False)
 	host_last_name = db.Column(db.String(50), nullable=False)
@@ -10,4 +48,64 @@ class Show(db.Model):
 	end_date = db.Column(db.Date, nullable=False)
 	start_time = db.Column(db.Time, nullable=False)
 	end_time = db.Column(db.Time, nullable=False)
-	days_of_week = db.Column(db.String(20), nullable=False)
\ No newline at end of file
+	days_mask = db.Column(db.Integer, nullable=False)
+	first_day = db.Column(db.Integer, nullable=False)
+	stream_id = db.Column(db.Integer, db.ForeignKey('stream.id'), nullable=True, index=True)
+
+	@property
+	def days_of_week(self):
+		"""Comma separated day abbreviations, also usable as a cron day_of_week field."""
+
+		return ','.join(mask_days(self.days_mask or 0))
+
+	@days_of_week.setter
+	def days_of_week(self, value):
+		self.days_mask = parse_days(value)
+		self.first_day = (self.days_mask & -self.days_mask).bit_length() - 1
+
+	@property
+	def day_names(self):
+		return ', '.join(DAY_NAMES[DAYS.index(day)] for day in mask_days(self.days_mask or 0))
+
+class Recording(db.Model):
+	__table_args__ = (db.Index('ix_recording_show_air_date', 'show_id', 'air_date'),)
+
+	id = db.Column(db.Integer, primary_key=True)
+	path = db.Column(db.String(500), nullable=False, unique=True)
+	show_id = db.Column(db.Integer, nullable=True)
+	host = db.Column(db.String(101), nullable=True)
+	air_date = db.Column(db.Date, nullable=False, index=True)
+	duration = db.Column(db.Float, nullable=True)
+	size = db.Column(db.BigInteger, nullable=False, default=0)
+	checksum = db.Column(db.String(64), nullable=True)
+	tier = db.Column(db.String(10), nullable=False, default='hot')
+	dead_air = db.Column(db.Float, nullable=True)
+	created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+	def log_fields(self):
+		"""Structured logging fields for this recording."""
+
+		return {'recording_id': self.id, 'show_id': self.show_id, 'file': self.path}
+
+class DataVersion(db.Model):
+	"""Change counter per kind of data, bumped in the same transaction as the change."""
+
+	name = db.Column(db.String(50), primary_key=True)
+	version = db.Column(db.Integer, nullable=False, default=0)
+
+class SchedulerState(db.Model):
+	"""Values the scheduler keeps next to its persisted jobs, such as the fingerprint they were built from."""
+
+	name = db.Column(db.String(50), primary_key=True)
+	value = db.Column(db.String(200), nullable=False)
+
+class PostProcessJob(db.Model):
+	id = db.Column(db.Integer, primary_key=True)
+	path = db.Column(db.String(500), nullable=False, unique=True)
+	show_id = db.Column(db.Integer, nullable=True)
+	params = db.Column(db.Text, nullable=False, default='{}')
+	steps_done = db.Column(db.String(200), nullable=False, default='')
+	status = db.Column(db.String(20), nullable=False, default='pending', index=True)
+	attempts = db.Column(db.Integer, nullable=False, default=0)
+	error = db.Column(db.Text, nullable=True)
+	updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
@@ -0,0 +1,85 @@
+"""Minimal MPEG audio (Layer III) frame parsing used to cut streams on frame boundaries."""
+
+from collections import namedtuple
+
+FrameHeader = namedtuple('FrameHeader', ['length', 'samples', 'sample_rate', 'bitrate'])
+
+_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    25: [11025, 12000, 8000],
+}
+_VERSIONS = {0b11: 1, 0b10: 2, 0b00: 25}
+
+def parse_header(data, offset=0):
+    """Parse the 4-byte frame header at ``offset``, returning a FrameHeader or None."""
+
+    if offset + 4 > len(data):
+        return None
+    b0, b1, b2 = data[offset], data[offset + 1], data[offset + 2]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version = _VERSIONS.get((b1 >> 3) & 0b11)
+    layer = (b1 >> 1) & 0b11
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0b11
+    if version is None or layer != 0b01 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    bitrate = _BITRATES[1 if version == 1 else 2][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 1
+    if version == 1:
+        return FrameHeader(144 * bitrate // sample_rate + padding, 1152, sample_rate, bitrate)
+    return FrameHeader(72 * bitrate // sample_rate + padding, 576, sample_rate, bitrate)
+
+def find_sync(data, start=0):
+    """Return the offset of the first frame in ``data`` at or after ``start``, or -1.
+
+    A candidate header only counts if the following frame also starts with a
+    valid header, or if the candidate frame runs to the end of ``data``.
+    """
+
+    end = len(data) - 3
+    offset = start
+    while offset < end:
+        offset = data.find(b'\xff', offset, end)
+        if offset < 0:
+            return -1
+        header = parse_header(data, offset)
+        if header is not None:
+            following = offset + header.length
+            if following + 4 > len(data) or parse_header(data, following) is not None:
+                return offset
+        offset += 1
+    return -1
+
+def iter_frames(data, start=0):
+    """Yield ``(offset, header)`` for consecutive frames, resyncing over junk."""
+
+    offset = find_sync(data, start)
+    while 0 <= offset < len(data):
+        header = parse_header(data, offset)
+        if header is None:
+            offset = find_sync(data, offset + 1)
+            continue
+        if offset + header.length > len(data):
+            return
+        yield offset, header
+        offset += header.length
+
+def estimate_duration(path, probe_bytes=65536):
+    """Estimate the length in seconds of a constant bitrate MP3 file from its first frame."""
+
+    with open(path, 'rb') as f:
+        head = f.read(probe_bytes)
+        size = f.seek(0, 2)
+    offset = find_sync(head)
+    if offset < 0:
+        return None
+    return (size - offset) * 8 / parse_header(head, offset).bitrate
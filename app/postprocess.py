@@ -0,0 +1,179 @@
+from concurrent.futures import ProcessPoolExecutor
+from .models import db, Show, PostProcessJob
+from .logger import init_logger
+from . import catalog, preview
+import threading
+import ffmpeg
+import queue
+import json
+import os
+
+STEPS = ('trim', 'loudness', 'tag', 'transcode')
+
+processor = None
+logger = None
+
+def init_postprocess(app):
+    """Start the post-processing workers and requeue jobs left over from a previous run."""
+
+    global processor, logger
+    logger = init_logger(name=__name__)
+    logger.info("Post-processing logger initialized.")
+
+    steps = [step for step in STEPS if step in app.config['POSTPROCESS_STEPS']]
+    if not steps or processor is not None:
+        return
+
+    processor = PostProcessor(app, steps, app.config['POSTPROCESS_WORKERS'])
+    processor.resume()
+
+def _ffmpeg_run(stream):
+    stream.global_args('-loglevel', 'error').overwrite_output().run(capture_stdout=True, capture_stderr=True)
+
+def run_step(step, path, params):
+    """Run one post-processing step on ``path`` in a worker process.
+
+    Every step writes to a temporary file and then renames it into place, so
+    an interrupted step leaves the input untouched and can simply be rerun.
+    """
+
+    base, ext = os.path.splitext(path)
+    tmp = f"{base}.{step}.tmp{ext}"
+
+    if step == 'trim':
+        stream = ffmpeg.input(path, t=params['trim_duration']).output(tmp, acodec='copy')
+    elif step == 'loudness':
+        stream = ffmpeg.input(path).output(
+            tmp, af=f"loudnorm=I={params['loudness_target']}:TP=-1.5:LRA=11",
+            acodec='libmp3lame', audio_bitrate=params['bitrate']
+        )
+    elif step == 'tag':
+        metadata = {f"metadata:g:{i}": f"{key}={value}" for i, (key, value) in enumerate(params['tags'].items())}
+        stream = ffmpeg.input(path).output(tmp, acodec='copy', id3v2_version=3, **metadata)
+    elif step == 'transcode':
+        for bitrate in params['transcode_bitrates']:
+            target = f"{base}_{bitrate}{ext}"
+            _ffmpeg_run(ffmpeg.input(path).output(tmp, acodec='libmp3lame', audio_bitrate=bitrate))
+            os.replace(tmp, target)
+        return
+    else:
+        raise ValueError(f"Unknown post-processing step {step}")
+
+    _ffmpeg_run(stream)
+    os.replace(tmp, path)
+
+class PostProcessor:
+    """Runs post-processing jobs off the capture path in a bounded process pool.
+
+    Jobs are stored in the ``PostProcessJob`` table and record each step as it
+    completes, so a restart resumes from the first unfinished step.
+    """
+
+    def __init__(self, app, steps, workers):
+        self.app = app
+        self.steps = steps
+        self.max_attempts = app.config['POSTPROCESS_MAX_ATTEMPTS']
+        self._queue = queue.Queue()
+        self._pool = ProcessPoolExecutor(max_workers=workers)
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"PostProcess {i}", daemon=True).start()
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def resume(self):
+        """Requeue unfinished jobs that have attempts left."""
+
+        with self.app.app_context():
+            jobs = PostProcessJob.query.filter(
+                PostProcessJob.status.in_(('pending', 'running', 'failed')),
+                PostProcessJob.attempts < self.max_attempts
+            ).all()
+            for job in jobs:
+                self._queue.put(job.id)
+        if jobs:
+            logger.info(f"Requeued {len(jobs)} post-processing jobs.")
+
+    def submit(self, recording):
+        """Create or reset the job for a finished recording and queue it."""
+
+        config = self.app.config
+        capture_start = max(recording.start, recording.started_at or recording.start)
+        params = {
+            'trim_duration': (recording.end - capture_start).total_seconds(),
+            'loudness_target': config['POSTPROCESS_LOUDNESS_TARGET'],
+            'bitrate': config['POSTPROCESS_BITRATE'],
+            'transcode_bitrates': config['POSTPROCESS_TRANSCODE_BITRATES'],
+            'tags': {'date': recording.start.strftime('%Y-%m-%d')},
+        }
+
+        with self.app.app_context():
+            show = db.session.get(Show, recording.show_id) if recording.show_id else None
+            if show is not None:
+                host = f"{show.host_first_name} {show.host_last_name}"
+                params['tags'].update(
+                    artist=host,
+                    title=f"{host} {recording.start.strftime('%m-%d-%y')}",
+                    comment=f"Show {show.id}",
+                )
+
+            job = PostProcessJob.query.filter_by(path=recording.output_file).first()
+            if job is None:
+                job = PostProcessJob(path=recording.output_file)
+                db.session.add(job)
+            job.show_id = recording.show_id
+            job.params = json.dumps(params)
+            job.steps_done = ''
+            job.status = 'pending'
+            job.attempts = 0
+            job.error = None
+            db.session.commit()
+            job_id = job.id
+
+        self._queue.put(job_id)
+        logger.info(f"Post-processing queued for {recording.output_file}.", extra=recording.log_fields())
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                with self.app.app_context():
+                    self._process(db.session.get(PostProcessJob, job_id))
+            except Exception as e:
+                logger.error(f"Post-processing error for job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _process(self, job):
+        if job is None or job.status == 'done':
+            return
+
+        job.status = 'running'
+        job.attempts += 1
+        db.session.commit()
+
+        params = json.loads(job.params)
+        done = set(filter(None, job.steps_done.split(',')))
+        for step in self.steps:
+            if step in done:
+                continue
+            try:
+                self._pool.submit(run_step, step, job.path, params).result()
+            except Exception as e:
+                error = e.stderr.decode(errors='replace').strip() if isinstance(e, ffmpeg.Error) else str(e)
+                job.status = 'failed'
+                job.error = f"{step}: {error[-500:]}"
+                db.session.commit()
+                logger.error(f"Post-processing step {step} failed for {job.path}: {job.error}",
+                             extra={'show_id': job.show_id, 'file': job.path})
+                return
+            done.add(step)
+            job.steps_done = ','.join(s for s in self.steps if s in done)
+            db.session.commit()
+
+        job.status = 'done'
+        db.session.commit()
+        catalog.catalog_file(job.path)
+        preview.queue_preview(job.path)
+        logger.info(f"Post-processing finished for {job.path}.", extra={'show_id': job.show_id, 'file': job.path})
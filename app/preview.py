@@ -0,0 +1,311 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, namedtuple
+from .logger import init_logger
+from .mp3 import estimate_duration
+from . import leader
+import threading
+import tempfile
+import struct
+import ffmpeg
+import math
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EXTENSION = '.peaks'
+MAGIC = b'SRPV'
+VERSION = 1
+# magic, version, source mtime_ns, source size, duration, integrated loudness (NaN if unknown), points
+HEADER = struct.Struct('<4sHqqffI')
+
+SEGMENTS_PER_READ = 10
+GATE_LOW = -70.0
+GATE_STEP = 0.1
+GATE_BINS = 800
+
+# ITU-R BS.1770 K-weighting at 48 kHz: high shelf, then the RLB high-pass.
+K_FILTER = (
+    ((1.53512485958697, -2.69169618940638, 1.19839281085285), (1.0, -1.69065929318241, 0.73248077421585)),
+    ((1.0, -2.0, 1.0), (1.0, -1.99004745483398, 0.99007225036621)),
+)
+
+Preview = namedtuple('Preview', ['peaks', 'loudness', 'duration', 'stamp'])
+
+settings = {'enabled': False, 'points': 2000, 'sample_rate': 22050, 'workers': 2, 'cache_size': 256}
+generator = None
+logger = None
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def init_preview(app):
+    """Load preview settings from the app config."""
+
+    global logger
+    logger = init_logger(name=__name__)
+    logger.info("Preview logger initialized.")
+
+    settings.update(
+        enabled=app.config['PREVIEW_ENABLED'],
+        points=app.config['PREVIEW_POINTS'],
+        sample_rate=app.config['PREVIEW_SAMPLE_RATE'],
+        workers=app.config['PREVIEW_WORKERS'],
+        cache_size=app.config['PREVIEW_CACHE_SIZE'],
+    )
+    if settings['enabled'] and np is None:
+        settings['enabled'] = False
+        logger.warning("NumPy is not installed, recording previews disabled.")
+
+def start_preview_workers(app):
+    """Start the preview generator pool in the leader process."""
+
+    global generator
+    if settings['enabled'] and generator is None:
+        generator = PreviewGenerator(settings['workers'])
+
+def sidecar_path(path):
+    return f"{os.path.splitext(path)[0]}{EXTENSION}"
+
+def _stamp(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def load(path):
+    """Return the Preview of ``path``, or None if it has none or the recording changed since."""
+
+    stamp = _stamp(path)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached.stamp == stamp:
+            _cache.move_to_end(path)
+            return cached
+
+    preview = read_sidecar(sidecar_path(path))
+    if preview is None or preview.stamp != stamp:
+        return None
+    with _cache_lock:
+        _cache[path] = preview
+        while len(_cache) > settings['cache_size']:
+            _cache.popitem(last=False)
+    return preview
+
+def read_sidecar(sidecar):
+    try:
+        with open(sidecar, 'rb') as f:
+            magic, version, mtime_ns, size, duration, loudness, points = HEADER.unpack(f.read(HEADER.size))
+            peaks = np.frombuffer(f.read(points * 2), dtype=np.int8).reshape(-1, 2)
+    except (OSError, struct.error, ValueError):
+        return None
+    if magic != MAGIC or version != VERSION:
+        return None
+    return Preview(peaks, None if math.isnan(loudness) else loudness, duration, (mtime_ns, size))
+
+def write_sidecar(sidecar, preview):
+    """Write ``preview`` next to its recording, replacing any older one atomically."""
+
+    header = HEADER.pack(MAGIC, VERSION, *preview.stamp[:2], preview.duration,
+                         math.nan if preview.loudness is None else preview.loudness, len(preview.peaks))
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(sidecar), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(preview.peaks.astype(np.int8).tobytes())
+        os.replace(temp_path, sidecar)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def discard(path):
+    """Remove the preview of a recording that is being moved or deleted."""
+
+    with _cache_lock:
+        _cache.pop(path, None)
+    if os.path.exists(sidecar_path(path)):
+        os.remove(sidecar_path(path))
+
+def to_dict(preview):
+    return {
+        'duration': round(preview.duration, 3),
+        'loudness': round(preview.loudness, 1) if preview.loudness is not None else None,
+        'peaks': preview.peaks.tolist(),
+    }
+
+def queue_preview(path):
+    """Queue a preview of ``path`` if this process generates previews."""
+
+    if generator is not None:
+        generator.submit(path)
+
+def _k_weighting(sample_rate, n):
+    """Per-bin factors turning an rfft of ``n`` samples into the K-weighted mean square."""
+
+    z = np.exp(-2j * np.pi * np.fft.rfftfreq(n, 1 / sample_rate) / 48000)
+    response = np.ones(len(z))
+    for b, a in K_FILTER:
+        response *= np.abs(np.polyval(b[::-1], z) / np.polyval(a[::-1], z)) ** 2
+    response[1:(n + 1) // 2] *= 2
+    return response / n ** 2
+
+def _read_full(stream, view):
+    filled = 0
+    while filled < len(view):
+        read = stream.readinto(view[filled:])
+        if not read:
+            break
+        filled += read
+    return filled
+
+def _integrated_loudness(counts, sums):
+    """Gated integrated loudness from a histogram of 400 ms block energies, or None for silence."""
+
+    if not counts.sum():
+        return None
+    gate = -0.691 + 10 * math.log10(sums.sum() / counts.sum()) - 10
+    first = max(0, math.ceil((gate - GATE_LOW) / GATE_STEP))
+    if not counts[first:].sum():
+        return None
+    return -0.691 + 10 * math.log10(sums[first:].sum() / counts[first:].sum())
+
+def _merge_peaks(peaks, points):
+    """Merge consecutive min/max pairs so at most ``points`` are left."""
+
+    group = -(-len(peaks) // points)
+    padded = np.concatenate([peaks, np.repeat(peaks[-1:], -len(peaks) % group, axis=0)])
+    columns = padded.reshape(-1, group, 2)
+    return np.stack([columns[:, :, 0].min(axis=1), columns[:, :, 1].max(axis=1)], axis=1)
+
+def analyze(stream, sample_rate, channels, frames_hint, points):
+    """Compute min/max peaks and integrated loudness from float32 PCM read from ``stream``.
+
+    The stream is read one second at a time into a fixed buffer. Peaks cover
+    ``frames_hint / points`` frames each, or one second without a hint, and
+    are merged down to at most ``points`` once the length is known.
+    Loudness follows BS.1770: the K-weighted mean square of overlapping
+    400 ms blocks, taken from the spectra of 100 ms segments, is gated at
+    -70 LUFS and then 10 LU below the ungated level. Block energies go into
+    a fixed histogram, so memory does not grow with the recording's length.
+    Returns ``(peaks, loudness, duration)``.
+    """
+
+    segment = sample_rate // 10
+    per_point = max(1, -(-frames_hint // points)) if frames_hint else sample_rate
+    weights = _k_weighting(sample_rate, segment)[:, None]
+    buffer = bytearray(segment * SEGMENTS_PER_READ * channels * 4)
+    view = memoryview(buffer)
+
+    counts = np.zeros(GATE_BINS)
+    sums = np.zeros(GATE_BINS)
+    pending = None
+    tail = np.empty(0)
+    peaks = []
+    frames = 0
+
+    while True:
+        filled = _read_full(stream, view)
+        filled -= filled % (channels * 4)
+        if not filled:
+            break
+        samples = np.frombuffer(buffer, dtype='<f4', count=filled // 4).reshape(-1, channels)
+        frames += len(samples)
+
+        mid = samples.mean(axis=1)
+        if pending is not None:
+            low, high, filled_point = pending
+            head, mid = mid[:per_point - filled_point], mid[per_point - filled_point:]
+            pending = (min(low, head.min()), max(high, head.max()), filled_point + len(head))
+            if pending[2] == per_point:
+                peaks.append(np.array([pending[:2]]))
+                pending = None
+        whole = len(mid) - len(mid) % per_point
+        if whole:
+            columns = mid[:whole].reshape(-1, per_point)
+            peaks.append(np.stack([columns.min(axis=1), columns.max(axis=1)], axis=1))
+        if len(mid) > whole:
+            pending = (mid[whole:].min(), mid[whole:].max(), len(mid) - whole)
+
+        count = len(samples) // segment
+        if count:
+            spectra = np.fft.rfft(samples[:count * segment].reshape(count, segment, channels), axis=1)
+            energy = np.concatenate([tail, (np.abs(spectra) ** 2 * weights).sum(axis=(1, 2))])
+            if len(energy) >= 4:
+                blocks = np.convolve(energy, np.full(4, 0.25), 'valid')
+                blocks = blocks[blocks > 0]
+                levels = -0.691 + 10 * np.log10(blocks)
+                gated = levels >= GATE_LOW
+                bins = np.minimum(((levels[gated] - GATE_LOW) / GATE_STEP).astype(int), GATE_BINS - 1)
+                counts += np.bincount(bins, minlength=GATE_BINS)
+                sums += np.bincount(bins, weights=blocks[gated], minlength=GATE_BINS)
+            tail = energy[-3:]
+
+    if pending is not None:
+        peaks.append(np.array([pending[:2]]))
+    peaks = np.concatenate(peaks) if peaks else np.empty((0, 2))
+    if len(peaks) > points:
+        peaks = _merge_peaks(peaks, points)
+    peaks = np.clip(np.round(peaks * 127), -127, 127).astype(np.int8)
+    return peaks, _integrated_loudness(counts, sums), frames / sample_rate
+
+def generate(path):
+    """Decode ``path`` once and write its preview sidecar, returning the Preview."""
+
+    stamp = _stamp(path)
+    rate = settings['sample_rate']
+    frames_hint = int((estimate_duration(path) or 0) * rate)
+    process = (
+        ffmpeg
+        .input(path)
+        .output('pipe:', format='f32le', ac=2, ar=rate)
+        .global_args('-loglevel', 'error')
+        .run_async(pipe_stdout=True, pipe_stderr=True)
+    )
+    try:
+        peaks, loudness, duration = analyze(process.stdout, rate, 2, frames_hint, settings['points'])
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.wait()
+    if process.returncode:
+        raise RuntimeError(stderr.decode(errors='replace').strip()[-500:])
+
+    preview = Preview(peaks, loudness, duration, stamp)
+    write_sidecar(sidecar_path(path), preview)
+    with _cache_lock:
+        _cache.pop(path, None)
+    return preview
+
+class PreviewGenerator:
+    """Generates previews in a small thread pool, one job per recording at a time.
+
+    Decoding happens in an ffmpeg subprocess per job, so threads are enough
+    to keep several recordings going at once.
+    """
+
+    def __init__(self, workers):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Preview")
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, path):
+        with self._lock:
+            if path in self._pending:
+                return
+            self._pending.add(path)
+        self._pool.submit(self._run, path)
+
+    def _run(self, path):
+        try:
+            if load(path) is None:
+                preview = generate(path)
+                logger.info(f"Preview generated for {path}, {len(preview.peaks)} points, loudness {preview.loudness} LUFS.",
+                            extra={'file': path})
+        except Exception as e:
+            logger.error(f"Error generating preview for {path}: {e}", extra={'file': path})
+        finally:
+            with self._lock:
+                self._pending.discard(path)
+
+leader.register('queue_preview', queue_preview)
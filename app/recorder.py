@@ -0,0 +1,359 @@
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from .logger import init_logger
+from . import stream_tap, rolling_buffer, postprocess, catalog, retention, metrics, silence, preview
+import itertools
+import threading
+import shutil
+import ffmpeg
+import json
+import time
+import os
+
+HISTORY_SIZE = 50
+KILL_GRACE_SECONDS = 30
+STABLE_PART_SECONDS = 60
+
+logger = None
+manager = None
+
+def init_recorder(app):
+    """Create the recorder manager from the app config."""
+
+    global logger, manager
+    logger = init_logger(name=__name__)
+    logger.info("Recorder logger initialized.")
+
+    if manager is None:
+        manager = RecorderManager(app.config['RECORDER_MAX_CONCURRENT'])
+
+class Recording:
+    """State of one capture, from being queued until it finishes."""
+
+    def __init__(self, recording_id, mode, stream_url, output_file, start, end, show_id=None, stream=None):
+        self.id = recording_id
+        self.show_id = show_id
+        self.stream = stream
+        self.mode = mode
+        self.stream_url = stream_url
+        self.output_file = output_file
+        self.start = start
+        self.end = end
+        self.state = 'queued'
+        self.pid = None
+        self.exit_code = None
+        self.exit_codes = []
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.start_offset = None
+        self.parts = []
+        self.gaps = []
+        self.silences = None
+        self._sink = None
+
+    @property
+    def bytes_written(self):
+        if self._sink is not None:
+            return self._sink.bytes_written
+        paths = self.parts if self.parts and not os.path.exists(self.output_file) else [self.output_file]
+        return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+    @property
+    def dead_air_seconds(self):
+        """Seconds of dead air detected during the capture, or None if it was not analyzed."""
+
+        if self.silences is None:
+            return None
+        return sum((end - start).total_seconds() for start, end in self.silences)
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return max(0.0, ((self.finished_at or datetime.now()) - self.started_at).total_seconds())
+
+    def log_fields(self):
+        """Structured logging fields for this capture."""
+
+        return {'recording_id': self.id, 'show_id': self.show_id, 'file': self.output_file}
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'show_id': self.show_id,
+            'stream': self.stream.name if self.stream is not None else None,
+            'mode': self.mode,
+            'state': self.state,
+            'output_file': self.output_file,
+            'start': self.start.isoformat(),
+            'end': self.end.isoformat(),
+            'pid': self.pid,
+            'bytes_written': self.bytes_written,
+            'elapsed': round(self.elapsed, 1),
+            'start_offset': round(self.start_offset, 3) if self.start_offset is not None else None,
+            'exit_code': self.exit_code,
+            'exit_codes': self.exit_codes,
+            'error': self.error,
+            'gaps': len(self.gaps),
+            'dead_air': round(self.dead_air_seconds, 1) if self.silences is not None else None,
+        }
+
+class RecorderManager:
+    """Runs captures on supervisor threads so scheduler threads return immediately.
+
+    At most ``max_concurrent`` captures hold a slot at once, and at most the
+    stream's own limit per stream; further ones wait in the 'queued' state
+    and record only what is left of their window once a slot frees up.
+    """
+
+    def __init__(self, max_concurrent):
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._active = {}
+        self._history = deque(maxlen=HISTORY_SIZE)
+
+    def submit(self, mode, stream_url, output_file, start, end, show_id=None, stream=None):
+        """Queue a capture of ``start``-``end`` and return its Recording.
+
+        ``stream`` is the StreamState the capture counts against, if any.
+        """
+
+        recording = Recording(next(self._ids), mode, stream_url, output_file, start, end, show_id, stream)
+        with self._lock:
+            self._active[recording.id] = recording
+        threading.Thread(target=self._supervise, args=(recording,), name=f"Recording {recording.id}", daemon=True).start()
+        return recording
+
+    def active(self):
+        with self._lock:
+            return list(self._active.values())
+
+    def history(self):
+        with self._lock:
+            return list(self._history)
+
+    def status(self):
+        return {
+            'max_concurrent': self.max_concurrent,
+            'active': [r.to_dict() for r in self.active()],
+            'recent': [r.to_dict() for r in reversed(self.history())],
+        }
+
+    def _supervise(self, recording):
+        try:
+            if not retention.ensure_free_space():
+                logger.error(f"Starting {recording.output_file} with low free space.", extra=recording.log_fields())
+            if recording.mode == 'buffer':
+                _capture_buffer(recording, self._slots)
+            else:
+                with recording.stream.slot() if recording.stream is not None else nullcontext(), self._slots:
+                    now = datetime.now()
+                    remaining = (recording.end - now).total_seconds()
+                    if remaining <= 0:
+                        raise RuntimeError("window ended while waiting for a free recorder slot")
+                    recording.state = 'warming' if recording.start > now else 'recording'
+                    recording.started_at = max(now, recording.start)
+                    silence.watch(recording.stream_url)
+                    try:
+                        if recording.mode == 'tap':
+                            _capture_tap(recording, remaining)
+                        else:
+                            _capture_ffmpeg(recording, remaining)
+                    finally:
+                        silence.unwatch(recording.stream_url)
+                    if recording.start_offset is not None:
+                        logger.info(f"Recording {recording.output_file} started {recording.start_offset * 1000:+.0f} ms "
+                                    f"from its scheduled start.", extra=dict(recording.log_fields(), start_offset=round(recording.start_offset, 3)))
+            # Reconnects may fail and recover, so the outcome is whether any audio was kept.
+            written = recording.bytes_written
+            if not written:
+                recording.state = 'failed'
+                recording.error = recording.error or "no audio received from the stream"
+                logger.error(f"Recording {recording.output_file} wrote no audio.", extra=recording.log_fields())
+            else:
+                recording.state = 'finished'
+            logger.info(f"Recording finished for {recording.output_file}, {written} bytes written.",
+                        extra=dict(recording.log_fields(), duration=round(recording.elapsed, 1)))
+            if written and os.path.exists(recording.output_file):
+                catalog.catalog_file(recording.output_file, recording.show_id, recording.start.date(),
+                                     dead_air=recording.dead_air_seconds)
+                if postprocess.processor is not None:
+                    postprocess.processor.submit(recording)
+                else:
+                    preview.queue_preview(recording.output_file)
+        except Exception as e:
+            recording.state = 'failed'
+            recording.error = str(e)
+            logger.error(f"Recording error for {recording.output_file}: {e}", extra=recording.log_fields())
+        finally:
+            recording.finished_at = datetime.now()
+            metrics.increment('captures', recording.mode, recording.state)
+            if recording.stream is not None:
+                recording.stream.record(recording)
+            with self._lock:
+                self._active.pop(recording.id, None)
+                self._history.append(recording)
+
+def _append_file(out, path):
+    """Append ``path`` to the unbuffered file ``out``, using sendfile where available."""
+
+    with open(path, 'rb') as src:
+        size = os.fstat(src.fileno()).st_size
+        offset = 0
+        try:
+            while offset < size:
+                sent = os.sendfile(out.fileno(), src.fileno(), offset, size - offset)
+                if not sent:
+                    break
+                offset += sent
+        except (AttributeError, OSError):
+            src.seek(offset)
+            shutil.copyfileobj(src, out)
+
+def _finish_parts(recording):
+    """Stitch the recording's part files into its output file and write the sidecar manifest."""
+
+    if silence.settings['enabled']:
+        recording.silences = silence.spans(recording.stream_url, recording.started_at or recording.start, datetime.now())
+    manifest = {
+        'output_file': recording.output_file,
+        'start': recording.start.isoformat(),
+        'end': recording.end.isoformat(),
+        'start_offset': round(recording.start_offset, 3) if recording.start_offset is not None else None,
+        'parts': [{'file': os.path.basename(part), 'bytes': os.path.getsize(part)} for part in recording.parts],
+        'gaps': [
+            {'start': start.isoformat(), 'end': end.isoformat(), 'seconds': round((end - start).total_seconds(), 3)}
+            for start, end in recording.gaps
+        ],
+        'silences': [
+            {'start': start.isoformat(), 'end': end.isoformat(), 'seconds': round((end - start).total_seconds(), 3)}
+            for start, end in recording.silences or []
+        ],
+    }
+
+    if len(recording.parts) == 1:
+        os.replace(recording.parts[0], recording.output_file)
+    elif recording.parts:
+        with open(recording.output_file, 'wb', buffering=0) as out:
+            for part in recording.parts:
+                _append_file(out, part)
+        for part in recording.parts:
+            os.remove(part)
+
+    with open(f"{os.path.splitext(recording.output_file)[0]}.json", 'w') as f:
+        json.dump(manifest, f, indent=4)
+
+    if recording.gaps:
+        missing = sum(gap['seconds'] for gap in manifest['gaps'])
+        logger.warning(f"Recording {recording.output_file} stitched from {len(recording.parts)} parts, {missing:.1f}s missing.",
+                       extra=recording.log_fields())
+    if recording.silences:
+        logger.warning(f"Recording {recording.output_file} contains {recording.dead_air_seconds:.1f}s of dead air.",
+                       extra=recording.log_fields())
+
+def _capture_tap(recording, duration):
+    """Attach to the stream's tap until the window ends, writing only the frames that aired within it.
+
+    A capture attached before its start keeps the connection open and
+    buffered, so the first frame written is the one airing at the
+    scheduled start; its measured distance from the start is kept in
+    ``start_offset``.
+    """
+
+    tap = stream_tap.get_tap(recording.stream_url)
+    sink = recording._sink = tap.attach(stream_tap.FileSink(recording.output_file, recording.start, recording.end))
+    try:
+        wait = (recording.start - datetime.now()).total_seconds()
+        if wait > 0:
+            time.sleep(wait)
+            recording.state = 'recording'
+            duration -= wait
+        time.sleep(max(0.0, duration))
+    finally:
+        tap.detach(sink)
+        recording.start_offset = sink.start_offset
+        recording.parts = sink.parts
+        recording.gaps = list(sink.gaps)
+        if sink.disconnected_at is not None and sink.bytes_written:
+            recording.gaps.append((sink.disconnected_at, datetime.now()))
+        recording._sink = None
+        _finish_parts(recording)
+
+def _run_ffmpeg(recording, part, duration):
+    """Capture up to ``duration`` seconds into ``part``, returning ffmpeg's exit code."""
+
+    process = (
+        ffmpeg
+        .input(recording.stream_url, t=duration, rw_timeout=int(stream_tap.settings['timeout'] * 1000000))
+        .output(part, acodec='copy')
+        .global_args('-loglevel', 'error')
+        .overwrite_output()
+        .run_async(pipe_stderr=True)
+    )
+    recording.pid = process.pid
+    try:
+        _, stderr = process.communicate(timeout=duration + KILL_GRACE_SECONDS)
+    except Exception:
+        process.kill()
+        _, stderr = process.communicate()
+        logger.error(f"FFmpeg did not exit in time for {part}, killed.")
+    metrics.increment('ffmpeg_exits', process.returncode)
+    if process.returncode:
+        recording.error = stderr.decode(errors='replace').strip()[-500:]
+        logger.error(f"FFmpeg error: {recording.error}", extra=recording.log_fields())
+    return process.returncode
+
+def _capture_ffmpeg(recording, duration):
+    """Run ffmpeg until the window ends, reconnecting with backoff after drops and stalls.
+
+    FFmpeg cannot be told when to start writing, so a capture that warms up
+    early waits for its start before launching it. The first frame's distance
+    from the start is not known, so ``start_offset`` stays None.
+    """
+
+    wait = (recording.start - datetime.now()).total_seconds()
+    if wait > 0:
+        time.sleep(wait)
+        recording.state = 'recording'
+        duration = (recording.end - datetime.now()).total_seconds()
+    delay = stream_tap.settings['reconnect_delay']
+    try:
+        while True:
+            part = f"{recording.output_file}.part{len(recording.parts):03d}"
+            part_started = datetime.now()
+            recording.exit_codes.append(_run_ffmpeg(recording, part, duration))
+            recording.exit_code = next((code for code in recording.exit_codes if code), 0)
+            if os.path.exists(part) and os.path.getsize(part):
+                recording.parts.append(part)
+
+            dropped_at = datetime.now()
+            duration = (recording.end - dropped_at).total_seconds()
+            if duration < stream_tap.MIN_GAP_SECONDS:
+                break
+            if (dropped_at - part_started).total_seconds() >= STABLE_PART_SECONDS:
+                delay = stream_tap.settings['reconnect_delay']
+
+            logger.warning(f"Stream dropped during {recording.output_file}, reconnecting in {delay}s.", extra=recording.log_fields())
+            time.sleep(min(delay, duration))
+            delay = min(delay * 2, stream_tap.settings['reconnect_max_delay'])
+            recording.gaps.append((dropped_at, datetime.now()))
+            duration = (recording.end - datetime.now()).total_seconds()
+            if duration < stream_tap.MIN_GAP_SECONDS:
+                break
+    finally:
+        _finish_parts(recording)
+
+def _capture_buffer(recording, slots):
+    recording.state = 'waiting'
+    ready_at = recording.end + timedelta(seconds=rolling_buffer.settings['segment_seconds'] * 1.5)
+    delay = (ready_at - datetime.now()).total_seconds()
+    if delay > 0:
+        time.sleep(delay)
+    with slots:
+        recording.state = 'extracting'
+        recording.started_at = datetime.now()
+        rolling_buffer.buffer.extract(recording.start, recording.end, recording.output_file)
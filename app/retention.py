@@ -0,0 +1,246 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from .models import db, Recording, PostProcessJob
+from .logger import init_logger
+from . import catalog, preview
+import threading
+import shutil
+import ffmpeg
+import re
+import os
+
+RETENTION_JOB_ID = 'retention'
+FREE_SPACE_JOB_ID = 'retention_free_space'
+EVICTION_BATCH_SIZE = 50
+AIR_DATE_PATTERN = re.compile(r'_(\d{2}-\d{2}-\d{2})_RAWDATA\.mp3$')
+
+app = None
+logger = None
+_lock = threading.Lock()
+_dir_mtimes = {}
+
+def init_retention(flask_app):
+    """Register the periodic retention job with the scheduler."""
+
+    global app, logger
+    logger = init_logger(name=__name__)
+    logger.info("Retention logger initialized.")
+    app = flask_app
+
+    from .scheduler import scheduler
+    scheduler.add_job(
+        run_retention, 'interval',
+        minutes=app.config['RETENTION_INTERVAL_MINUTES'],
+        id=RETENTION_JOB_ID,
+        replace_existing=True
+    )
+
+def _air_date(path):
+    match = AIR_DATE_PATTERN.search(path)
+    if match:
+        return datetime.strptime(match.group(1), '%m-%d-%y').date()
+    return datetime.fromtimestamp(os.path.getmtime(path)).date()
+
+def scan_output_folder():
+    """Bring the catalog in line with OUTPUT_FOLDER, listing only directories whose mtime changed.
+
+    Returns the number of files added to or dropped from the catalog.
+    """
+
+    from . import recorder
+
+    root = app.config['OUTPUT_FOLDER']
+    # Captures still being written are catalogued by the recorder once they finish.
+    writing = {capture.output_file for capture in recorder.manager.active()} if recorder.manager is not None else set()
+    changed = 0
+    folders = [root] + [entry.path for entry in os.scandir(root) if entry.is_dir()]
+    for folder in folders:
+        mtime = os.stat(folder).st_mtime
+        if _dir_mtimes.get(folder) == mtime:
+            continue
+
+        on_disk = {entry.path for entry in os.scandir(folder) if entry.is_file() and entry.name.endswith('_RAWDATA.mp3')}
+        known = {
+            path for (path,) in db.session.query(Recording.path).filter(
+                Recording.tier == 'hot', Recording.path.like(f"{os.path.join(folder, '')}%")
+            )
+            if os.path.dirname(path) == folder
+        }
+        for path in on_disk - known - writing:
+            catalog.catalog_file(path, air_date=_air_date(path))
+            changed += 1
+        missing = known - on_disk
+        if missing:
+            Recording.query.filter(Recording.path.in_(missing)).delete(synchronize_session=False)
+            db.session.commit()
+            changed += len(missing)
+        if not on_disk & writing:
+            _dir_mtimes[folder] = mtime
+    return changed
+
+def _evict(recording, archive):
+    """Move a hot recording to the archive tier, or delete it if it is archived or there is no archive."""
+
+    preview.discard(recording.path)
+    if archive and recording.tier == 'hot':
+        folder = app.config['RETENTION_ARCHIVE_FOLDER']
+        os.makedirs(folder, exist_ok=True)
+        target = os.path.join(folder, os.path.basename(recording.path))
+        bitrate = app.config['RETENTION_ARCHIVE_BITRATE']
+        if bitrate:
+            (
+                ffmpeg
+                .input(recording.path)
+                .output(target, acodec='libmp3lame', audio_bitrate=bitrate)
+                .global_args('-loglevel', 'error')
+                .overwrite_output()
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+            os.remove(recording.path)
+        else:
+            shutil.move(recording.path, target)
+        logger.info(f"Archived {recording.path} to {target}.")
+        recording.path = target
+        recording.tier = 'archive'
+        recording.size = os.path.getsize(target)
+        recording.checksum = catalog.file_checksum(target)
+    else:
+        if os.path.exists(recording.path):
+            os.remove(recording.path)
+        logger.info(f"Deleted recording {recording.path}.")
+        db.session.delete(recording)
+    db.session.commit()
+
+def _try_evict(recording, archive):
+    """Evict ``recording``, logging and rolling back instead of raising if it fails."""
+
+    fields = recording.log_fields()
+    try:
+        _evict(recording, archive)
+        return True
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error evicting {fields['file']}, skipping it: {e}", extra=fields)
+        return False
+
+def _candidates(tier):
+    """Recordings in ``tier`` that post-processing is not working on, oldest first."""
+
+    busy = db.session.query(PostProcessJob.path).filter(PostProcessJob.status.in_(('pending', 'running')))
+    return Recording.query.filter(Recording.tier == tier, Recording.path.not_in(busy)).order_by(
+        Recording.air_date, Recording.id
+    )
+
+def _device(path):
+    """Device ID of ``path``, or of its closest existing parent."""
+
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return os.stat(path).st_dev
+
+def _apply_policies(min_free_bytes=None):
+    config = app.config
+    archive = bool(config['RETENTION_ARCHIVE_FOLDER'])
+    if min_free_bytes and archive and _device(config['RETENTION_ARCHIVE_FOLDER']) == _device(config['OUTPUT_FOLDER']):
+        # Archiving onto the same filesystem frees nothing; only the quota applies.
+        logger.warning("Archive folder shares the output folder's filesystem, not archiving to free space.")
+        min_free_bytes = None
+    today = datetime.now().date()
+    evicted = 0
+
+    if config['RETENTION_MAX_AGE_DAYS']:
+        cutoff = today - timedelta(days=config['RETENTION_MAX_AGE_DAYS'])
+        for recording in _candidates('hot').filter(Recording.air_date < cutoff).all():
+            if _try_evict(recording, archive):
+                evicted += 1
+
+    if config['RETENTION_KEEP_LAST_PER_SHOW']:
+        ranked = db.session.query(
+            Recording.id,
+            func.row_number().over(partition_by=Recording.show_id, order_by=Recording.air_date.desc()).label('rank')
+        ).filter(Recording.tier == 'hot', Recording.show_id.isnot(None)).subquery()
+        surplus = db.session.query(ranked.c.id).filter(ranked.c.rank > config['RETENTION_KEEP_LAST_PER_SHOW'])
+        for recording in _candidates('hot').filter(Recording.id.in_(surplus)).all():
+            if _try_evict(recording, archive):
+                evicted += 1
+
+    if config['RETENTION_ARCHIVE_MAX_AGE_DAYS']:
+        cutoff = today - timedelta(days=config['RETENTION_ARCHIVE_MAX_AGE_DAYS'])
+        for recording in _candidates('archive').filter(Recording.air_date < cutoff).all():
+            if _try_evict(recording, archive):
+                evicted += 1
+
+    max_bytes = config['RETENTION_MAX_BYTES']
+    total = db.session.query(func.coalesce(func.sum(Recording.size), 0)).filter(Recording.tier == 'hot').scalar()
+
+    def needs_space():
+        if max_bytes and total > max_bytes:
+            return True
+        return min_free_bytes and shutil.disk_usage(config['OUTPUT_FOLDER']).free < min_free_bytes
+
+    failed = set()
+    while needs_space():
+        batch = _candidates('hot').filter(Recording.id.not_in(failed)).limit(EVICTION_BATCH_SIZE).all()
+        if not batch:
+            break
+        for recording in batch:
+            if not needs_space():
+                break
+            recording_id, size = recording.id, recording.size
+            if _try_evict(recording, archive):
+                total -= size
+                evicted += 1
+            else:
+                failed.add(recording_id)
+
+    return evicted
+
+def run_retention():
+    """Scheduler job: refresh the catalog incrementally and apply the retention policies."""
+
+    if app is None:
+        return
+    with _lock, app.app_context():
+        try:
+            started = datetime.now()
+            scanned = scan_output_folder()
+            evicted = _apply_policies()
+            elapsed = (datetime.now() - started).total_seconds()
+            logger.info(f"Retention run finished in {elapsed:.2f}s: {scanned} catalog changes, {evicted} recordings evicted.")
+        except Exception as e:
+            logger.error(f"Error running retention: {e}")
+
+def free_space():
+    """Scheduler job: evict recordings oldest first until OUTPUT_FOLDER has MIN_FREE_BYTES free."""
+
+    if app is None:
+        return
+    folder = app.config['OUTPUT_FOLDER']
+    min_free = app.config['MIN_FREE_BYTES']
+    with _lock, app.app_context():
+        try:
+            _apply_policies(min_free_bytes=min_free)
+        except Exception as e:
+            logger.error(f"Error freeing space: {e}")
+    free = shutil.disk_usage(folder).free
+    if free < min_free:
+        logger.error(f"Only {free} bytes free in {folder} after eviction.")
+
+def ensure_free_space():
+    """Check OUTPUT_FOLDER has MIN_FREE_BYTES free, queueing eviction on the scheduler if not.
+
+    Called before each capture starts, so it never evicts itself. Returns
+    True if enough space is free.
+    """
+
+    if app is None:
+        return True
+    folder = app.config['OUTPUT_FOLDER']
+    min_free = app.config['MIN_FREE_BYTES']
+    if not min_free or shutil.disk_usage(folder).free >= min_free:
+        return True
+
+    logger.warning(f"Free space in {folder} below {min_free} bytes, queueing eviction of old recordings.")
+    from .scheduler import scheduler
+    scheduler.add_job(free_space, id=FREE_SPACE_JOB_ID, replace_existing=True)
+    return False
@@ -0,0 +1,164 @@
+from collections import deque, namedtuple
+from datetime import datetime, timedelta
+from .logger import init_logger
+from .mp3 import iter_frames
+from . import stream_tap, leader
+import threading
+import os
+
+Segment = namedtuple('Segment', ['start', 'end', 'path', 'size'])
+
+settings = {'enabled': False, 'folder': None, 'segment_seconds': 60, 'retention_hours': 24, 'max_bytes': None}
+buffer = None
+logger = None
+
+def init_rolling_buffer(app):
+    """Start continuous capture into the segment ring if enabled in the app config."""
+
+    global buffer, logger
+    logger = init_logger(name=__name__)
+    logger.info("Rolling buffer logger initialized.")
+
+    settings.update(
+        enabled=app.config['ROLLING_BUFFER_ENABLED'],
+        folder=app.config['ROLLING_BUFFER_FOLDER'],
+        segment_seconds=app.config['ROLLING_BUFFER_SEGMENT_SECONDS'],
+        retention_hours=app.config['ROLLING_BUFFER_RETENTION_HOURS'],
+        max_bytes=app.config['ROLLING_BUFFER_MAX_BYTES'],
+    )
+    if not settings['enabled'] or buffer is not None:
+        return
+
+    os.makedirs(settings['folder'], exist_ok=True)
+    buffer = SegmentRing(settings['folder'], settings['segment_seconds'])
+    stream_tap.get_tap(app.config['STREAM_URL']).attach(buffer)
+    logger.info(f"Rolling buffer capturing into {settings['folder']}.")
+
+def _segment_name(start, end):
+    return f"{int(start.timestamp() * 1000)}-{int(end.timestamp() * 1000)}.mp3"
+
+def _parse_segment(folder, name):
+    """Return the Segment for a closed segment file name, or None."""
+
+    stem, ext = os.path.splitext(name)
+    try:
+        start_ms, end_ms = (int(part) for part in stem.split('-'))
+    except ValueError:
+        return None
+    if ext != '.mp3':
+        return None
+    path = os.path.join(folder, name)
+    return Segment(datetime.fromtimestamp(start_ms / 1000), datetime.fromtimestamp(end_ms / 1000),
+                   path, os.path.getsize(path))
+
+class SegmentRing:
+    """Stream tap sink that writes whole MP3 frames into fixed-length segment files.
+
+    Each closed segment is named after its start and end wall-clock times in
+    milliseconds. The start is derived from the close time minus the audio
+    duration of the segment, so the listener burst Icecast sends on connect
+    is not stamped as live audio.
+    """
+
+    def __init__(self, folder, segment_seconds):
+        self.path = folder
+        self.segment_seconds = segment_seconds
+        self._current_path = os.path.join(folder, 'current.part')
+        self._current = open(self._current_path, 'wb')
+        self._current_seconds = 0.0
+        self._current_size = 0
+        self._pending = b''
+        self._lock = threading.Lock()
+
+        found = (_parse_segment(folder, name) for name in os.listdir(folder))
+        self.segments = deque(sorted((s for s in found if s is not None), key=lambda s: s.start))
+        self.total_bytes = sum(s.size for s in self.segments)
+
+    def write(self, chunk):
+        with self._lock:
+            if self._current.closed:
+                return
+            data = self._pending + chunk
+            consumed = 0
+            for offset, header in iter_frames(data):
+                self._current.write(data[offset:offset + header.length])
+                self._current_size += header.length
+                self._current_seconds += header.samples / header.sample_rate
+                consumed = offset + header.length
+                if self._current_seconds >= self.segment_seconds:
+                    self._rotate()
+            self._pending = data[consumed:][-65536:]
+
+    def on_disconnect(self):
+        with self._lock:
+            self._pending = b''
+
+    def _rotate(self):
+        """Close the current segment, add it to the ring and enforce retention."""
+
+        self._current.close()
+        end = datetime.now()
+        start = end - timedelta(seconds=self._current_seconds)
+        path = os.path.join(self.path, _segment_name(start, end))
+        os.replace(self._current_path, path)
+        self.segments.append(Segment(start, end, path, self._current_size))
+        self.total_bytes += self._current_size
+
+        self._current = open(self._current_path, 'wb')
+        self._current_seconds = 0.0
+        self._current_size = 0
+        self._expire(end)
+
+    def _expire(self, now):
+        cutoff = now - timedelta(hours=settings['retention_hours'])
+        max_bytes = settings['max_bytes']
+        while self.segments and (self.segments[0].end < cutoff or (max_bytes and self.total_bytes > max_bytes)):
+            segment = self.segments.popleft()
+            self.total_bytes -= segment.size
+            try:
+                os.remove(segment.path)
+            except OSError as e:
+                logger.error(f"Error removing buffer segment {segment.path}: {e}")
+
+    def close(self):
+        with self._lock:
+            self._current.close()
+
+    def extract(self, start, end, output_file):
+        """Write the frames covering ``start``-``end`` to ``output_file`` without re-encoding.
+
+        Returns the number of bytes written. Raises LookupError if no closed
+        segment overlaps the window.
+        """
+
+        with self._lock:
+            segments = [s for s in self.segments if s.end > start and s.start < end]
+        if not segments:
+            raise LookupError(f"No buffered audio between {start} and {end}.")
+
+        written = 0
+        with open(output_file, 'wb') as out:
+            for segment in segments:
+                with open(segment.path, 'rb') as f:
+                    data = f.read()
+                first = last = None
+                position = segment.start
+                for offset, header in iter_frames(data):
+                    frame_end = position + timedelta(seconds=header.samples / header.sample_rate)
+                    if frame_end > start and first is None:
+                        first = offset
+                    position = frame_end
+                    last = offset + header.length
+                    if position >= end:
+                        break
+                if first is not None:
+                    out.write(memoryview(data)[first:last])
+                    written += last - first
+        return written
+
+def _extract(start, end, output_file):
+    if buffer is None:
+        raise RuntimeError("the rolling buffer is not enabled")
+    buffer.extract(datetime.fromisoformat(start), datetime.fromisoformat(end), output_file)
+
+leader.register('extract_buffer', _extract)
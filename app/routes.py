@@ -1,16 +1,26 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
-from .scheduler import refresh_schedule, pause_shows_until
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app, send_file, jsonify, Response, stream_with_context
+from .scheduler import sync_show, request_refresh
 from .utils import update_user_config
 from datetime import datetime, time
-from .models import db, Show
-from sqlalchemy import case
+from .models import db, Show, Recording, Stream
 from functools import wraps
 from .logger import init_logger
+from . import recorder, postprocess, timeline, config_store, leader, silence, preview, streams
+from .show_index import get_index, apply_committed, validate_show
+from .bulk import import_shows, export_shows, iter_csv, iter_json
+import os
 
 main_bp = Blueprint('main', __name__)
-logger = init_logger()
+logger = init_logger(name=__name__)
 logger.info("Routes logger initialized.")
 
+@main_bp.before_app_request
+def refresh_config():
+	"""Pick up user config changes made by other processes."""
+
+	if config_store.store is not None:
+		config_store.store.refresh()
+
 def admin_required(f):
 	"""Decorator to require admin authentication."""
  
@@ -23,6 +33,39 @@ def admin_required(f):
 		return f(*args, **kwargs)
 	return decorated_function
 
+def check_show(show, exclude_id=None):
+	"""Flash validation messages for a show's time window, returning False if it is rejected."""
+
+	errors, warnings = validate_show(show, exclude_id=exclude_id)
+	for message in errors:
+		flash(message, "danger")
+	for message in warnings:
+		flash(message, "warning")
+	if errors:
+		logger.warning(f"Show rejected: {' '.join(errors)}")
+	return not errors
+
+def stream_choice():
+	"""Return the stream ID picked in a show form, None for the default stream."""
+
+	stream_id = request.form.get('stream_id', type=int)
+	if stream_id is not None and db.session.get(Stream, stream_id) is None:
+		raise ValueError(f"stream {stream_id} does not exist")
+	return stream_id
+
+def stream_fields():
+	"""Read a stream form, raising ValueError on bad input."""
+
+	name = request.form['name'].strip()
+	url = request.form['url'].strip()
+	if not name or not url:
+		raise ValueError("name and URL are required")
+	bitrate = request.form.get('bitrate', type=int)
+	max_concurrent = request.form.get('max_concurrent', type=int)
+	if (bitrate is not None and bitrate <= 0) or (max_concurrent is not None and max_concurrent <= 0):
+		raise ValueError("bitrate and concurrent captures must be positive")
+	return {'name': name, 'url': url, 'bitrate': bitrate, 'max_concurrent': max_concurrent}
+
 @main_bp.route('/')
 def index():
 	"""Redirect to the shows page."""
@@ -36,19 +79,9 @@ def index():
 def shows():
 	"""Render the shows database page sorted and paginated."""
 
-	day_order = case(
-		(Show.days_of_week == 'mon', 1),
-		(Show.days_of_week == 'tue', 2),
-		(Show.days_of_week == 'wed', 3),
-		(Show.days_of_week == 'thu', 4),
-		(Show.days_of_week == 'fri', 5),
-		(Show.days_of_week == 'sat', 6),
-		(Show.days_of_week == 'sun', 7)
-	)
-
 	page = request.args.get('page', 1, type=int)
 	shows_column = Show.query.order_by(
-		day_order,
+		Show.first_day,
 		Show.start_time,
 		Show.start_date
 	).paginate(page=page, per_page=15)
@@ -110,14 +143,6 @@ def add_show():
 				flash("End date cannot be in the past!", "danger")
 				return redirect(url_for('main.add_show'))
 
-			#if end_time_obj == time(0, 0) and start_time_obj != time(0, 0):
-			#	pass
-			#elif end_time_obj <= start_time_obj:
-			#	flash("End time cannot be before start time!", "danger")
-			#	return redirect(url_for('main.add_show'))
-
-			short_day_name = request.form['days_of_week'].lower()[:3]
-
 			show = Show(
 				host_first_name=request.form['host_first_name'],
 				host_last_name=request.form['host_last_name'],
@@ -125,17 +150,22 @@ def add_show():
 				end_date=end_date_obj,
 				start_time=start_time_obj,
 				end_time=end_time_obj,
-				days_of_week=short_day_name
+				days_of_week=request.form.getlist('days_of_week'),
+				stream_id=stream_choice()
 			)
+			if not check_show(show):
+				return redirect(url_for('main.add_show'))
+
 			db.session.add(show)
 			db.session.commit()
-			refresh_schedule()
+			apply_committed(lambda index: index.add(show))
+			sync_show(show.id)
 			logger.info("Show added successfully.")
 			flash("Show added successfully!", "success")
 			return redirect(url_for('main.shows'))
 
 		logger.info("Rendering add show page.")
-		return render_template('add_show.html')
+		return render_template('add_show.html', streams=Stream.query.order_by(Stream.name).all())
 	except Exception as e:
 		logger.error(f"Error adding show: {e}")
 		flash(f"Error adding show: {e}", "danger")
@@ -149,25 +179,28 @@ def edit_show(id):
 	show = Show.query.get_or_404(id)
 	try:
 		if request.method == 'POST':
-			short_day_name = request.form['days_of_week'].lower()[:3]
-
 			show.host_first_name = request.form['host_first_name']
 			show.host_last_name = request.form['host_last_name']
 			show.start_date = datetime.strptime(request.form['start_date'], '%Y-%m-%d').date()
 			show.end_date = datetime.strptime(request.form['end_date'], '%Y-%m-%d').date()
 			show.start_time = datetime.strptime(request.form['start_time'].strip(), '%H:%M').time()
 			show.end_time = datetime.strptime(request.form['end_time'].strip(), '%H:%M').time()
-			show.days_of_week = short_day_name
+			show.days_of_week = request.form.getlist('days_of_week')
+			show.stream_id = stream_choice()
+			if not check_show(show, exclude_id=show.id):
+				db.session.rollback()
+				return redirect(url_for('main.edit_show', id=id))
 
 			db.session.commit()
-			refresh_schedule()
+			apply_committed(lambda index: index.add(show))
+			sync_show(show.id)
 			logger.info("Show updated successfully.")
 			flash("Show updated successfully!", "success")
 
 			return redirect(url_for('main.shows'))
 
 		logger.info(f'Rendering edit show page for show {id}.')
-		return render_template('edit_show.html', show=show)
+		return render_template('edit_show.html', show=show, streams=Stream.query.order_by(Stream.name).all())
 	except Exception as e:
 		logger.error(f"Error editing show: {e}")
 		flash(f"Error editing show: {e}", "danger")
@@ -209,20 +242,80 @@ def settings():
 		'default_start_date': config['DEFAULT_START_DATE'],
 		'default_end_date': config['DEFAULT_END_DATE'],
 		'auto_create_show_folders': config['AUTO_CREATE_SHOW_FOLDERS'],
+		'streams': Stream.query.order_by(Stream.name).all(),
 	}
 
 	logger.info(f'Rendering settings page.')
 	return render_template('settings.html', **settings_data)
 
+@main_bp.route('/streams/add', methods=['POST'])
+@admin_required
+def add_stream():
+	"""Add a stream that shows can record from."""
+
+	try:
+		stream = Stream(**stream_fields())
+		db.session.add(stream)
+		db.session.commit()
+		logger.info(f"Stream {stream.name} added.")
+		flash("Stream added successfully!", "success")
+	except Exception as e:
+		db.session.rollback()
+		logger.error(f"Error adding stream: {e}")
+		flash(f"Error adding stream: {e}", "danger")
+	return redirect(url_for('main.settings'))
+
+@main_bp.route('/streams/<int:id>/edit', methods=['POST'])
+@admin_required
+def edit_stream(id):
+	"""Update a stream; its shows record from the new URL from their next capture on."""
+
+	stream = Stream.query.get_or_404(id)
+	try:
+		for field, value in stream_fields().items():
+			setattr(stream, field, value)
+		db.session.commit()
+		logger.info(f"Stream {stream.name} updated.")
+		flash("Stream updated successfully!", "success")
+	except Exception as e:
+		db.session.rollback()
+		logger.error(f"Error updating stream: {e}")
+		flash(f"Error updating stream: {e}", "danger")
+	return redirect(url_for('main.settings'))
+
+@main_bp.route('/streams/<int:id>/delete', methods=['POST'])
+@admin_required
+def delete_stream(id):
+	"""Delete a stream no show records from."""
+
+	stream = Stream.query.get_or_404(id)
+	try:
+		in_use = Show.query.filter_by(stream_id=id).count()
+		if in_use:
+			flash(f"Stream {stream.name} is used by {in_use} shows, move them to another stream first.", "danger")
+			return redirect(url_for('main.settings'))
+		db.session.delete(stream)
+		db.session.commit()
+		logger.info(f"Stream {stream.name} deleted.")
+		flash("Stream deleted successfully!", "success")
+	except Exception as e:
+		db.session.rollback()
+		logger.error(f"Error deleting stream: {e}")
+		flash(f"Error deleting stream: {e}", "danger")
+	return redirect(url_for('main.settings'))
+
 @main_bp.route('/update_schedule', methods=['POST'])
 @admin_required
 def update_schedule():
 	"""Route to refresh the schedule."""
 
 	try:
-		refresh_schedule()
+		stats = request_refresh()
+		if stats is None:
+			raise RuntimeError("schedule reconciliation failed, see log for details")
 		logger.info("Schedule updated successfully.")
-		flash("Schedule updated successfully!", "success")
+		flash(f"Schedule updated successfully! {stats['added']} added, {stats['modified']} modified, "
+			  f"{stats['removed']} removed in {stats['duration_ms']} ms.", "success")
 		return redirect(url_for('main.shows'))
 	except Exception as e:
 		logger.error(f"Error updating schedule: {e}")
@@ -238,7 +331,8 @@ def delete_show(id):
 		show = Show.query.get_or_404(id)
 		db.session.delete(show)
 		db.session.commit()
-		refresh_schedule()
+		apply_committed(lambda index: index.remove(id))
+		sync_show(id)
 		logger.info("Show deleted successfully.")
 		flash("Show deleted successfully!", "success")
 		return redirect(url_for('main.shows'))
@@ -255,7 +349,8 @@ def clear_all():
 	try:
 		db.session.query(Show).delete()
 		db.session.commit()
-		refresh_schedule()
+		apply_committed(lambda index: index.clear())
+		request_refresh()
 		logger.info("All shows have been deleted.")
 		flash("All shows have been deleted.", "info")
 		return redirect(url_for('main.shows'))
@@ -273,10 +368,11 @@ def pause():
 		pause_end_date = request.form.get('pause_end_date')
 		if pause_end_date:
 			pause_end_date = datetime.strptime(pause_end_date, '%Y-%m-%d')
-			pause_shows_until(pause_end_date)
-			update_user_config({"PAUSE_SHOW_END_DATE": pause_end_date.strftime('%Y-%m-%d')})
 
-		update_user_config({"PAUSE_SHOWS_RECORDING": True})
+		update_user_config({
+			"PAUSE_SHOWS_RECORDING": True,
+			"PAUSE_SHOW_END_DATE": pause_end_date.strftime('%Y-%m-%d') if pause_end_date else None,
+		})
 
 		flash(f"Recordings paused{' until ' + pause_end_date.strftime('%d-%m-%y') if pause_end_date else ' indefinitely'}.", "warning")
 		logger.info(f"Recordings paused{' until ' + pause_end_date.strftime('%d-%m-%y') if pause_end_date else ' indefinitely'}.")
@@ -299,4 +395,228 @@ def resume():
 		logger.error(f"Error resuming recordings: {e}")
 		flash(f"Error resuming recordings: {e}", "danger")
   
-	return redirect(url_for('main.settings'))
\ No newline at end of file
+	return redirect(url_for('main.settings'))
+
+@main_bp.route('/buffer/extract', methods=['POST'])
+@admin_required
+def buffer_extract():
+	"""Extract a time window from the rolling buffer and download it."""
+
+	try:
+		start = datetime.strptime(request.form['start'], '%Y-%m-%dT%H:%M')
+		end = datetime.strptime(request.form['end'], '%Y-%m-%dT%H:%M')
+		if end <= start:
+			flash("End time cannot be before start time!", "danger")
+			return redirect(url_for('main.settings'))
+
+		output_file = os.path.join(
+			current_app.config['OUTPUT_FOLDER'],
+			f"Buffer_{start.strftime('%m-%d-%y_%H-%M')}_{end.strftime('%m-%d-%y_%H-%M')}.mp3"
+		)
+		leader.call('extract_buffer', start.isoformat(), end.isoformat(), output_file)
+		logger.info(f"Buffer window {start} to {end} extracted to {output_file}.")
+		return send_file(output_file, as_attachment=True)
+	except Exception as e:
+		logger.error(f"Error extracting from rolling buffer: {e}")
+		flash(f"Error extracting from rolling buffer: {e}", "danger")
+		return redirect(url_for('main.settings'))
+
+@main_bp.route('/recorder')
+@admin_required
+def recorder_status():
+	"""Render the active and recent recordings page."""
+
+	try:
+		state = leader.call('recorder_status')
+	except RuntimeError as e:
+		logger.error(f"Error fetching recorder status: {e}")
+		flash(f"Error fetching recorder status: {e}", "danger")
+		return redirect(url_for('main.shows'))
+
+	logger.info("Rendering recorder status page.")
+	return render_template('recorder_status.html', status=state, postprocess=state['postprocess'],
+		silence=state['silence'], streams=state['streams'])
+
+@main_bp.route('/recorder/status.json')
+@admin_required
+def recorder_status_json():
+	"""Return the active and recent recordings, stream health and dead air alerts as JSON."""
+
+	try:
+		state = leader.call('recorder_status')
+	except RuntimeError as e:
+		return jsonify({'error': str(e)}), 503
+	state.pop('postprocess')
+	return jsonify(state)
+
+@main_bp.route('/schedule/upcoming')
+@admin_required
+def upcoming():
+	"""Render the upcoming recordings as a day-by-day calendar."""
+
+	days = request.args.get('days', type=int)
+	calendar = {}
+	for occurrence in timeline.upcoming(days=days):
+		calendar.setdefault(occurrence.start.date(), []).append(occurrence)
+
+	logger.info("Rendering upcoming recordings page.")
+	return render_template('upcoming.html', calendar=calendar)
+
+@main_bp.route('/schedule/upcoming.json')
+@admin_required
+def upcoming_json():
+	"""Return the upcoming recordings as JSON."""
+
+	occurrences = timeline.upcoming(days=request.args.get('days', type=int), limit=request.args.get('limit', type=int))
+	return jsonify({'occurrences': [timeline.to_dict(occurrence) for occurrence in occurrences], 'count': len(occurrences)})
+
+@main_bp.route('/metrics')
+def metrics_endpoint():
+	"""Expose operational metrics in the Prometheus text format.
+
+	Open to logged-in admins, and to scrapers presenting METRICS_TOKEN as a
+	bearer token when one is configured.
+	"""
+
+	token = current_app.config['METRICS_TOKEN']
+	if not session.get('authenticated') and (token is None or request.headers.get('Authorization') != f"Bearer {token}"):
+		logger.warning("Unauthorized metrics request.")
+		return Response("Unauthorized\n", status=401, mimetype='text/plain')
+	try:
+		body = leader.call('metrics')
+	except RuntimeError as e:
+		logger.error(f"Error fetching metrics: {e}")
+		return Response(f"{e}\n", status=503, mimetype='text/plain')
+	return Response(body, mimetype='text/plain; version=0.0.4')
+
+@main_bp.route('/recordings')
+@admin_required
+def recordings():
+	"""Render the recordings catalog, newest first and paginated."""
+
+	page = request.args.get('page', 1, type=int)
+	show_id = request.args.get('show_id', type=int)
+
+	query = Recording.query
+	if show_id is not None:
+		query = query.filter(Recording.show_id == show_id)
+	recordings_column = query.order_by(Recording.air_date.desc(), Recording.id.desc()).paginate(page=page, per_page=25)
+
+	logger.info("Rendering recordings page.")
+	return render_template('recordings.html', recordings=recordings_column, show_id=show_id)
+
+@main_bp.route('/recordings/<int:id>/download')
+@admin_required
+def download_recording(id):
+	"""Stream a recording to the client, honouring HTTP Range requests."""
+
+	recording = Recording.query.get_or_404(id)
+	if not os.path.exists(recording.path):
+		logger.warning(f"Recording file missing: {recording.path}")
+		flash("Recording file no longer exists.", "danger")
+		return redirect(url_for('main.recordings'))
+
+	logger.info(f"Sending recording {recording.path}.")
+	return send_file(recording.path, mimetype='audio/mpeg', as_attachment=True, conditional=True,
+					 download_name=os.path.basename(recording.path))
+
+@main_bp.route('/recordings/<int:id>/preview.json')
+@admin_required
+def recording_preview(id):
+	"""Return a recording's waveform peaks and loudness, queueing them if they are missing or stale."""
+
+	recording = Recording.query.get_or_404(id)
+	if not os.path.exists(recording.path):
+		return jsonify({'error': "Recording file no longer exists."}), 404
+
+	found = preview.load(recording.path)
+	if found is None:
+		if not preview.settings['enabled']:
+			return jsonify({'error': "Previews are disabled."}), 404
+		try:
+			leader.call('queue_preview', recording.path)
+		except RuntimeError as e:
+			return jsonify({'error': str(e)}), 503
+		return jsonify({'status': 'pending'}), 202
+	return jsonify(preview.to_dict(found))
+
+@main_bp.route('/shows/conflicts.json')
+@admin_required
+def show_conflicts():
+	"""Return every pair of shows whose airtimes overlap as JSON."""
+
+	started = datetime.now()
+	conflicts = get_index().report()
+	elapsed = (datetime.now() - started).total_seconds() * 1000
+	return jsonify({'conflicts': conflicts, 'count': len(conflicts), 'elapsed_ms': round(elapsed, 3)})
+
+@main_bp.route('/shows/import', methods=['POST'])
+@admin_required
+def import_shows_route():
+	"""Import shows from an uploaded CSV or JSON file in one transaction."""
+
+	try:
+		upload = request.files['file']
+		fmt = request.form.get('format') or ('json' if upload.filename.lower().endswith(('.json', '.jsonl', '.ndjson')) else 'csv')
+		rows = iter_json(upload.stream) if fmt == 'json' else iter_csv(upload.stream)
+		report = import_shows(
+			rows,
+			dry_run='dry_run' in request.form,
+			skip_invalid='skip_invalid' in request.form
+		)
+		logger.info(f"Show import: {report['created']} created, {report['updated']} updated, "
+					f"{report['unchanged']} unchanged, {len(report['errors'])} errors.")
+	except Exception as e:
+		logger.error(f"Error importing shows: {e}")
+		if request.args.get('report') == 'json':
+			return jsonify({'error': str(e)}), 400
+		flash(f"Error importing shows: {e}", "danger")
+		return redirect(url_for('main.shows'))
+
+	if request.args.get('report') == 'json':
+		return jsonify(report)
+
+	summary = f"{report['created']} created, {report['updated']} updated, {report['unchanged']} unchanged"
+	if report.get('aborted'):
+		flash(f"Import aborted, {len(report['errors'])} rows have errors. Nothing was saved.", "danger")
+	elif report['dry_run']:
+		flash(f"Dry run: {summary}.", "info")
+		for entry in [entry for entry in report['rows'] if entry['action'] in ('create', 'update')][:5]:
+			if entry['action'] == 'create':
+				flash(f"Row {entry['row']}: create {entry['changes']['host_first_name'][1]} {entry['changes']['host_last_name'][1]}.", "info")
+			else:
+				changes = ', '.join(f"{field} {old} → {new}" for field, (old, new) in entry['changes'].items())
+				flash(f"Row {entry['row']}: update show {entry['id']}: {changes}.", "info")
+	else:
+		flash(f"Import complete: {summary}.", "success")
+	for error in report['errors'][:5]:
+		flash(f"Row {error['row']}: {error['error']}", "warning")
+	return redirect(url_for('main.shows'))
+
+@main_bp.route('/shows/export')
+@admin_required
+def export_shows_route():
+	"""Stream all shows as CSV or JSON."""
+
+	fmt = 'json' if request.args.get('format') == 'json' else 'csv'
+	logger.info(f"Exporting shows as {fmt}.")
+	return Response(
+		stream_with_context(export_shows(fmt)),
+		mimetype='application/json' if fmt == 'json' else 'text/csv',
+		headers={'Content-Disposition': f'attachment; filename=shows.{fmt}'}
+	)
+
+def _recorder_status():
+	"""The recorder, post-processing, stream and dead air state of this process."""
+
+	if recorder.manager is None:
+		state = {'max_concurrent': 0, 'active': [], 'recent': []}
+		active = []
+	else:
+		state = recorder.manager.status()
+		active = recorder.manager.active()
+	processor = postprocess.processor
+	return dict(state, silence=silence.status(), streams=streams.status(active),
+		postprocess={'queue_depth': processor.queue_depth, 'steps': list(processor.steps)} if processor is not None else None)
+
+leader.register('recorder_status', _recorder_status)
@@ -1,95 +1,353 @@
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.base import BaseTrigger
 from datetime import datetime, time, timedelta
-from sqlalchemy import inspect
-from flask import current_app
+from sqlalchemy import inspect, select
 from .logger import init_logger
-from .models import db, Show
-from .utils import update_user_config
-import ffmpeg
+from .models import db, Show, SchedulerState
+from .show_index import discard_show
+from .database import background_job
+from . import stream_tap, rolling_buffer, recorder, metrics, config_store, leader, database, streams
+import hashlib
 import json
 import os
 
 scheduler = BackgroundScheduler()
 logger = None
+_jobstore = None
+
+RECORD_JOB_PREFIX = 'record_show_'
+DELETE_JOB_PREFIX = 'delete_show_'
+WARMUP_JOB_PREFIX = 'warmup_show_'
+RESUME_JOB_ID = 'resume_recordings'
+JOBS_TABLE = 'apscheduler_jobs'
+# Bump whenever the arguments or set of a show's jobs change, so persisted
+# jobs are rebuilt on the next start.
+JOB_ARGS_VERSION = 3
+FINGERPRINT_CONFIG = ('OUTPUT_FOLDER', 'AUTO_CREATE_SHOW_FOLDERS', 'RECORDING_LATE_START',
+                      'SCHEDULER_MISFIRE_GRACE_TIME', 'RECORDING_WARMUP_SECONDS')
 
 def init_scheduler(app):
-    """Initialize and start the scheduler with the Flask app context."""
+    """Configure the scheduler and start it paused.
+
+    A paused scheduler can still read and list jobs, which is all a follower
+    process needs; the leader calls ``start_scheduling`` to run them.
+    """
 
-    global logger
-    logger = init_logger()
+    global logger, _jobstore
+    logger = init_logger(name=__name__)
     logger.info("Scheduler logger initialized.")
 
     if not scheduler.running:
-        scheduler.start()
         with app.app_context():
-            logger.info("Scheduler initialized and started.")
+            jobstores = {}
+            if app.config['SCHEDULER_PERSISTENT_JOBS']:
+                jobstores['default'] = _jobstore = SQLAlchemyJobStore(engine=db.engine, tablename=JOBS_TABLE)
+            scheduler.configure(
+                jobstores=jobstores,
+                job_defaults={
+                    'misfire_grace_time': app.config['SCHEDULER_MISFIRE_GRACE_TIME'],
+                    'coalesce': app.config['SCHEDULER_COALESCE'],
+                }
+            )
+            scheduler.start(paused=True)
+            config_store.store.subscribe(_on_config_change)
+            logger.info("Scheduler initialized.")
+
+def start_scheduling(app):
+    """Run the scheduled jobs in this process, reconciling them first unless the stored ones are current.
+
+    Persisted jobs are reused as they are only when they were built from the
+    same job layout and schedule settings as this process would use.
+    """
+
+    with app.app_context():
+        if _jobstore is not None and _has_stored_jobs(_jobstore) and _stored_fingerprint() == schedule_fingerprint():
+            logger.info("Loaded persisted jobs, skipping schedule rebuild.")
+        else:
             refresh_schedule()
+    scheduler.resume()
+    logger.info("Scheduler started.")
+
+def _has_stored_jobs(jobstore):
+    """Cheaply check whether the persistent job store already holds any jobs."""
+
+    with jobstore.engine.connect() as connection:
+        return connection.execute(select(jobstore.jobs_t.c.id).limit(1)).first() is not None
+
+def schedule_fingerprint():
+    """Hash of the job layout and the settings that shape every show's jobs."""
+
+    config = database.app.config
+    values = [JOB_ARGS_VERSION, database.app.instance_path, str(scheduler.timezone)]
+    values += [config.get(name) for name in FINGERPRINT_CONFIG]
+    return hashlib.sha256(json.dumps(values, default=str).encode()).hexdigest()
+
+def _stored_fingerprint():
+    return db.session.execute(select(SchedulerState.value).where(SchedulerState.name == 'fingerprint')).scalar()
+
+def _store_fingerprint(fingerprint):
+    state = db.session.get(SchedulerState, 'fingerprint')
+    if state is None:
+        db.session.add(SchedulerState(name='fingerprint', value=fingerprint))
+    else:
+        state.value = fingerprint
+    db.session.commit()
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Keep the scheduler's job table out of Flask-Migrate autogeneration."""
+
+    return not (type_ == 'table' and name == JOBS_TABLE)
+
+def record_job_id(show_id):
+    """Stable scheduler job ID for a show's recording job."""
+
+    return f"{RECORD_JOB_PREFIX}{show_id}"
+
+def delete_job_id(show_id):
+    """Stable scheduler job ID for a show's deletion job."""
 
+    return f"{DELETE_JOB_PREFIX}{show_id}"
+
+def warmup_job_id(show_id):
+    """Stable scheduler job ID for a show's warm-up job."""
+
+    return f"{WARMUP_JOB_PREFIX}{show_id}"
+
+def show_id_from_job(job_id):
+    """Return the show ID encoded in a show job ID, or None for other jobs."""
+
+    for prefix in (RECORD_JOB_PREFIX, DELETE_JOB_PREFIX, WARMUP_JOB_PREFIX):
+        if job_id.startswith(prefix):
+            try:
+                return int(job_id[len(prefix):])
+            except ValueError:
+                return None
+    return None
+
+@background_job
 def refresh_schedule():
-    """Refresh the scheduler with the latest shows from the database."""
+    """Reconcile the scheduler with the shows in the database.
+
+    Only jobs whose show was added, changed or removed are touched; jobs that
+    are not tied to a show (such as the pause resume job) are left alone.
+    Returns a dict of counts and the elapsed time, or None on failure.
+    """
+
+    started = datetime.now()
+    stats = {'added': 0, 'modified': 0, 'removed': 0, 'unchanged': 0}
     try:
-        if 'show' in inspect(db.engine).get_table_names():
-            scheduler.remove_all_jobs()
-            for show in Show.query.all():
-                schedule_recording(show)
-            logger.info("Schedule refreshed with latest shows.")
+        if 'show' not in inspect(db.engine).get_table_names():
+            return None
+
+        existing = {job.id: job for job in scheduler.get_jobs()}
+        show_ids = set()
+
+        for show in Show.query.all():
+            show_ids.add(show.id)
+            stats[schedule_recording(show, existing)] += 1
+
+        stale_ids = {
+            show_id for show_id in map(show_id_from_job, existing)
+            if show_id is not None and show_id not in show_ids
+        }
+        for show_id in stale_ids:
+            unschedule_recording(show_id)
+            stats['removed'] += 1
+        _store_fingerprint(schedule_fingerprint())
+
+        elapsed = (datetime.now() - started).total_seconds()
+        metrics.observe_refresh(elapsed)
+        stats['duration_ms'] = round(elapsed * 1000, 2)
+        logger.info(
+            f"Schedule reconciled in {stats['duration_ms']} ms: {stats['added']} added, "
+            f"{stats['modified']} modified, {stats['removed']} removed, {stats['unchanged']} unchanged."
+        )
+        return stats
     except Exception as e:
         logger.error(f"Error refreshing schedule: {e}")
+        return None
 
 def pause_shows_until(date):
     """Pause all recordings until a specified date."""
 
     try:
         scheduler.add_job(
-            update_user_config, 'date',
+            resume_recordings, 'date',
             run_date=date,
-            args=[{"PAUSE_SHOWS_RECORDING": False, "PAUSE_END_DATE": None}]
+            id=RESUME_JOB_ID,
+            replace_existing=True
         )
         logger.info(f"Recordings resume job added.")
     except Exception as e:
         logger.error(f"Error adding resume jobs: {e}")
 
-def record_stream(stream_url, duration, output_file, config_file_path):
-    """Records the stream using FFmpeg."""
+def resume_recordings():
+    """Clear the pause flag once a pause reaches its end date."""
+
+    config_store.store.update({"PAUSE_SHOWS_RECORDING": False, "PAUSE_SHOW_END_DATE": None})
+    logger.info("Recordings resumed after pause end date.")
+
+def _on_config_change(changes):
+    """Keep the resume job in step with the pause settings as soon as they change."""
+
+    if 'PAUSE_SHOWS_RECORDING' not in changes and 'PAUSE_SHOW_END_DATE' not in changes:
+        return
+    if not leader.is_leader:
+        leader.call('reload_config')
+        return
+    end_date = config_store.store.get('PAUSE_SHOW_END_DATE')
+    if config_store.store.get('PAUSE_SHOWS_RECORDING') is True and end_date:
+        pause_shows_until(datetime.strptime(end_date, '%Y-%m-%d'))
+    elif scheduler.get_job(RESUME_JOB_ID) is not None:
+        scheduler.remove_job(RESUME_JOB_ID)
+        logger.info("Recordings resume job removed.")
+
+class LeadTrigger(BaseTrigger):
+    """Fires ``lead`` seconds before every fire time of ``trigger``."""
+
+    def __init__(self, trigger, lead):
+        self.trigger = trigger
+        self.lead = lead
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        lead = timedelta(seconds=self.lead)
+        if previous_fire_time is not None:
+            previous_fire_time += lead
+        fire_time = self.trigger.get_next_fire_time(previous_fire_time, now + lead)
+        return fire_time - lead if fire_time is not None else None
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} ({self.trigger!r}, lead={self.lead})>"
+
+def _scheduled_start(scheduled_time, now):
+    """Return the most recent datetime at which a show starting at ``scheduled_time`` aired."""
+
+    scheduled = datetime.combine(now.date(), scheduled_time)
+    if scheduled > now:
+        scheduled -= timedelta(days=1)
+    return scheduled
+
+def recording_path(output_file, air_date):
+    """Return the raw recording path for a show's output base and air date."""
+
+    return f"{output_file}_{air_date.strftime('%m-%d-%y')}_RAWDATA.mp3"
+
+@background_job
+def record_stream(stream_url, duration, output_file, config_file_path, scheduled_time=None, show_id=None, lead=0):
+    """Hand a show's capture (or its warm-up, when ``lead`` is set) to the recorder manager."""
 
-    with open(config_file_path, 'r') as file:
-        config = json.load(file)
-    if config['PAUSE_SHOWS_RECORDING'] is True:
+    if config_store.store.get('PAUSE_SHOWS_RECORDING') is True:
         logger.info("Recording paused. Skipping recording.")
         return
 
+    now = datetime.now()
+    air_date = now
+    if scheduled_time is not None:
+        air_date = _scheduled_start(scheduled_time, now + timedelta(seconds=lead))
+    if show_id is not None and any(r.show_id == show_id and r.start == air_date for r in recorder.manager.active()):
+        logger.info(f"Recording for show {show_id} already started by its warm-up.", extra={'show_id': show_id})
+        return
+    window_end = air_date + timedelta(seconds=duration)
+    output_file = recording_path(output_file, air_date)
+    stream = streams.for_show(show_id) if show_id is not None or stream_url is None else None
+    if stream is not None:
+        stream_url = stream.url
 
-    output_file = f"{output_file}_{datetime.now().strftime('%m-%d-%y')}_RAWDATA.mp3"
-    start_time = datetime.now().strftime('%H-%M-%S')
-    try:
-        (
-            ffmpeg
-            .input(stream_url, t=duration)
-            .output(output_file, acodec='copy')
-            .overwrite_output()
-            .run()
-        )
-        logger.info(f"Recording started for {output_file}.")
-        logger.info(f"Start time:{start_time}.")
-    except ffmpeg.Error as e:
-        logger.error(f"FFFmpeg error: {e.stderr.decode()}")
+    # The rolling buffer only holds the default stream.
+    if rolling_buffer.settings['enabled'] and (stream is None or stream.id is None):
+        mode = 'buffer'
+    else:
+        late_by = (now - air_date).total_seconds()
+        if late_by >= duration:
+            logger.warning(f"Recording for {output_file} missed its window by {late_by:.0f}s. Skipping recording.")
+            return
+        if late_by >= 1:
+            logger.warning(f"Recording for {output_file} started {late_by:.0f}s late, recording remaining {duration - late_by:.0f}s.")
+        mode = 'tap' if stream_tap.settings['enabled'] else 'ffmpeg'
+
+    recording = recorder.manager.submit(mode, stream_url, output_file, air_date, window_end, show_id, stream)
+    warming = f", {(air_date - now).total_seconds():.1f}s before its start" if air_date > now else ""
+    logger.info(f"Recording {recording.id} started for {output_file} ({mode}{warming}).",
+                extra=dict(recording.log_fields(), job_id=record_job_id(show_id) if show_id is not None else None, duration=duration))
+    logger.info(f"Start time:{now.strftime('%H-%M-%S')}.")
+
+def sync_show(show_id):
+    """Bring a show's jobs in line with the database after it was added, edited or deleted.
+
+    The work runs on the leader process; the result is what
+    ``schedule_recording`` returned, or 'removed' if the show is gone.
+    """
+
+    result = leader.call('sync_show', show_id)
+    _invalidate_timeline()
+    return result
 
+def request_refresh():
+    """Run ``refresh_schedule`` on the leader process and return its stats."""
+
+    stats = leader.call('refresh_schedule')
+    _invalidate_timeline()
+    return stats
+
+def _invalidate_timeline():
+    if not leader.is_leader:
+        from .timeline import invalidate
+        invalidate()
+
+@background_job
+def _sync_show(show_id):
+    show = db.session.get(Show, show_id)
+    if show is None:
+        discard_show(show_id)
+        unschedule_recording(show_id)
+        return 'removed'
+    return schedule_recording(show)
+
+def _reload_config():
+    config_store.store.refresh(force=True)
+
+@background_job
 def delete_show(show_id):
     """Delete a show from the database."""
 
     try:
-        with db.app_context():
-            show = Show.query.get(show_id)
-            if show:
-                db.session.delete(show)
-                db.session.commit()
+        show = db.session.get(Show, show_id)
+        if show:
+            db.session.delete(show)
+            db.session.commit()
         logger.info(f"Show with ID {show_id} deleted.")
-        refresh_schedule()
+        discard_show(show_id)
+        unschedule_recording(show_id)
     except Exception as e:
         logger.error(f"Error deleting show {show_id}: {e}")
 
-def schedule_recording(show):
-    """Schedules the recurring recording and deletion of a show."""
+def _job_matches(job, trigger, args, **options):
+    """Check whether an existing job already has the given trigger, args and options."""
+
+    return (
+        job is not None
+        and repr(job.trigger) == repr(trigger)
+        and list(job.args) == list(args)
+        and all(getattr(job, name) == value for name, value in options.items())
+    )
+
+def schedule_recording(show, existing=None):
+    """Schedules the recurring recording, its warm-up and the deletion of a show.
+
+    Jobs use stable per-show IDs, so calling this again for the same show
+    replaces its jobs in place. ``existing`` is an optional mapping of job ID
+    to job used by ``refresh_schedule`` to avoid a lookup per show. Returns
+    'added', 'modified', 'unchanged', or 'removed' for a show with no days.
+    """
+
+    if not show.days_mask:
+        logger.warning(f"Show {show.id} has no days of the week, not scheduling it.")
+        unschedule_recording(show.id)
+        return 'removed'
 
     start_time = datetime.combine(show.start_date, show.start_time)
     end_time = datetime.combine(show.start_date, show.end_time)
@@ -98,34 +356,92 @@ def schedule_recording(show):
         end_time += timedelta(days=1)
 
     duration = (end_time - start_time).total_seconds()
-    stream_url = current_app.config['STREAM_URL']
+    config = database.app.config
 
-    if current_app.config['AUTO_CREATE_SHOW_FOLDERS']:
-        show_folder = os.path.join(current_app.config['OUTPUT_FOLDER'], f"{show.host_first_name} {show.host_last_name}")
+    if config['AUTO_CREATE_SHOW_FOLDERS']:
+        show_folder = os.path.join(config['OUTPUT_FOLDER'], f"{show.host_first_name} {show.host_last_name}")
         if not os.path.exists(show_folder):
             os.mkdir(show_folder)
     else:
-        show_folder = current_app.config['OUTPUT_FOLDER']
+        show_folder = config['OUTPUT_FOLDER']
 
     output_file = os.path.join(show_folder, f"{show.host_first_name}_{show.host_last_name}")
-    user_config_path = os.path.join(current_app.instance_path, 'user_config.json')
+    user_config_path = os.path.join(database.app.instance_path, 'user_config.json')
+
+    record_id = record_job_id(show.id)
+    delete_id = delete_job_id(show.id)
+    warmup_id = warmup_job_id(show.id)
+    if existing is None:
+        existing = {job_id: scheduler.get_job(job_id) for job_id in (record_id, delete_id, warmup_id)}
+
+    record_trigger = CronTrigger(
+        day_of_week=show.days_of_week, hour=show.start_time.hour, minute=show.start_time.minute,
+        start_date=start_time, end_date=show.end_date, timezone=scheduler.timezone
+    )
+    record_args = [None, duration, output_file, user_config_path, show.start_time, show.id]
+    if config['RECORDING_LATE_START']:
+        record_grace = int(duration)
+    else:
+        record_grace = config['SCHEDULER_MISFIRE_GRACE_TIME']
+    delete_trigger = DateTrigger(run_date=show.end_date + timedelta(days=1), timezone=scheduler.timezone)
+    delete_args = [show.id]
+    lead = config['RECORDING_WARMUP_SECONDS']
+    warmup_trigger = LeadTrigger(record_trigger, lead)
+    warmup_args = record_args + [lead]
+
+    record_job = existing.get(record_id)
+    delete_job = existing.get(delete_id)
+    warmup_job = existing.get(warmup_id)
+    if (
+        _job_matches(record_job, record_trigger, record_args, misfire_grace_time=record_grace)
+        and _job_matches(delete_job, delete_trigger, delete_args)
+        and (_job_matches(warmup_job, warmup_trigger, warmup_args, misfire_grace_time=lead) if lead else warmup_job is None)
+    ):
+        return 'unchanged'
 
     try:
         scheduler.add_job(
-            record_stream, 'cron',
-            day_of_week=show.days_of_week, hour=show.start_time.hour, minute=show.start_time.minute,
-            args=[stream_url, duration, output_file, user_config_path],
-            start_date=start_time,
-            end_date=show.end_date,
+            record_stream, record_trigger,
+            args=record_args,
+            id=record_id,
+            misfire_grace_time=record_grace,
+            replace_existing=True
         )
-        logger.info(f"Recording scheduled for show {show.id}.")
+        logger.info(f"Recording scheduled for show {show.id}.", extra={'show_id': show.id, 'job_id': record_id})
+
+        if lead:
+            scheduler.add_job(
+                record_stream, warmup_trigger,
+                args=warmup_args,
+                id=warmup_id,
+                misfire_grace_time=lead,
+                replace_existing=True
+            )
+        elif warmup_job is not None:
+            scheduler.remove_job(warmup_id)
 
         scheduler.add_job(
-            delete_show, 'date',
-            run_date=show.end_date + timedelta(days=1),
-            args=[show.id]
+            delete_show, delete_trigger,
+            args=delete_args,
+            id=delete_id,
+            replace_existing=True
         )
         logger.info(f"Deletion scheduled for show {show.id} after last airing.")
     except Exception as e:
         logger.error(f"Error scheduling recording for show {show.id}: {e}")
 
+    return 'modified' if record_job is not None or delete_job is not None else 'added'
+
+def unschedule_recording(show_id):
+    """Remove the recording, warm-up and deletion jobs of a show, if present."""
+
+    for job_id in (record_job_id(show_id), delete_job_id(show_id), warmup_job_id(show_id)):
+        try:
+            scheduler.remove_job(job_id)
+        except JobLookupError:
+            pass
+    logger.info(f"Jobs removed for show {show_id}.")
+
+leader.register('sync_show', _sync_show)
+leader.register('refresh_schedule', refresh_schedule)
+leader.register('reload_config', _reload_config)
@@ -0,0 +1,83 @@
+from sqlalchemy import inspect, text
+from .models import db, Stream, parse_days
+import sqlalchemy as sa
+
+# Bump whenever the models change so existing databases go through the
+# migration path once more on their next start.
+SCHEMA_VERSION = 5
+
+def schema_is_current():
+    """Cheaply check whether the database was already brought up to SCHEMA_VERSION.
+
+    Only SQLite keeps the version (in PRAGMA user_version); other databases
+    always take the full migration path.
+    """
+
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    with db.engine.connect() as connection:
+        return connection.execute(text('PRAGMA user_version')).scalar() == SCHEMA_VERSION
+
+def mark_schema_current():
+    """Record that the database matches SCHEMA_VERSION."""
+
+    if db.engine.dialect.name == 'sqlite':
+        with db.engine.begin() as connection:
+            connection.execute(text(f'PRAGMA user_version = {SCHEMA_VERSION}'))
+
+def upgrade_schema(logger):
+    """Upgrade tables created by older versions in place.
+
+    Databases from before weekday bitmasks store one day name per show in
+    ``show.days_of_week``; those names are converted into ``days_mask`` and
+    ``first_day`` and the old column is dropped. Catalogs from before dead
+    air detection gain the nullable ``recording.dead_air`` column, and shows
+    from before multiple streams gain ``show.stream_id``, NULL for the
+    default stream.
+    """
+
+    inspector = inspect(db.engine)
+    tables = inspector.get_table_names()
+    if 'recording' in tables and 'dead_air' not in {column['name'] for column in inspector.get_columns('recording')}:
+        with db.engine.begin() as connection:
+            connection.execute(text('ALTER TABLE recording ADD COLUMN dead_air FLOAT'))
+        logger.info("Added dead_air to the recordings catalog.")
+
+    if 'show' not in tables:
+        return
+    columns = {column['name'] for column in inspector.get_columns('show')}
+    if 'stream_id' not in columns:
+        # Rebuilding the show table below reflects the foreign key's target.
+        Stream.__table__.create(db.engine, checkfirst=True)
+        with db.engine.begin() as connection:
+            connection.execute(text('ALTER TABLE show ADD COLUMN stream_id INTEGER REFERENCES stream (id)'))
+            connection.execute(text('CREATE INDEX IF NOT EXISTS ix_show_stream_id ON show (stream_id)'))
+        logger.info("Added stream_id to shows.")
+    if 'days_mask' in columns or 'days_of_week' not in columns:
+        return
+
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+
+    with db.engine.begin() as connection:
+        rows = connection.execute(text('SELECT id, days_of_week FROM show')).all()
+
+        operations = Operations(MigrationContext.configure(connection))
+        with operations.batch_alter_table('show') as batch:
+            batch.add_column(sa.Column('days_mask', sa.Integer(), nullable=False, server_default='0'))
+            batch.add_column(sa.Column('first_day', sa.Integer(), nullable=False, server_default='7'))
+            batch.drop_column('days_of_week')
+            batch.create_index('ix_show_first_day_start', ['first_day', 'start_time', 'start_date'])
+
+        updates = []
+        for show_id, days in rows:
+            try:
+                mask = parse_days(days)
+            except ValueError:
+                logger.error(f"Show {show_id} has unknown day {days!r}, it will not be scheduled.")
+                continue
+            updates.append({'id': show_id, 'mask': mask, 'first_day': (mask & -mask).bit_length() - 1})
+        if updates:
+            connection.execute(text('UPDATE show SET days_mask = :mask, first_day = :first_day WHERE id = :id'), updates)
+
+    logger.info(f"Converted days_of_week of {len(rows)} shows to weekday bitmasks.")
@@ -0,0 +1,222 @@
+from bisect import bisect_left, insort
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from .models import db, Show, DAYS
+from .database import data_version, committed_version
+import threading
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+def show_days(show):
+    """Return the weekday indexes (0 = Monday) a show airs on."""
+
+    return [DAYS.index(day) for day in show.days_of_week.split(',') if day in DAYS]
+
+def weekly_intervals(show):
+    """Return the show's airings as [start, end) minute-of-week intervals.
+
+    Shows whose end time is not after their start time run past midnight
+    into the next day; an airing that runs past Sunday midnight is split in
+    two so every interval lies within the week.
+    """
+
+    start = show.start_time.hour * 60 + show.start_time.minute
+    end = show.end_time.hour * 60 + show.end_time.minute
+    length = end - start if end > start else end + MINUTES_PER_DAY - start
+
+    intervals = []
+    for day in show_days(show):
+        week_start = day * MINUTES_PER_DAY + start
+        week_end = week_start + length
+        if week_end > MINUTES_PER_WEEK:
+            intervals.append((week_start, MINUTES_PER_WEEK))
+            intervals.append((0, week_end - MINUTES_PER_WEEK))
+        else:
+            intervals.append((week_start, week_end))
+    return intervals
+
+def _describe(show):
+    return {
+        'id': show.id,
+        'host': show.host,
+        'days': [DAYS[day] for day in show_days(show)],
+        'start_time': show.start_time.strftime('%H:%M'),
+        'end_time': show.end_time.strftime('%H:%M'),
+        'start_date': show.start_date.isoformat(),
+        'end_date': show.end_date.isoformat(),
+    }
+
+def _dates_overlap(a, b):
+    return a.start_date <= b.end_date and b.start_date <= a.end_date
+
+class ShowSnapshot:
+    """The scheduling fields of a show, detached from the database session."""
+
+    __slots__ = ('id', 'host', 'start_date', 'end_date', 'start_time', 'end_time', 'days_of_week', 'stream_id')
+
+    def __init__(self, show):
+        self.id = show.id
+        self.host = f"{show.host_first_name} {show.host_last_name}"
+        self.start_date = show.start_date
+        self.end_date = show.end_date
+        self.start_time = show.start_time
+        self.end_time = show.end_time
+        self.days_of_week = show.days_of_week
+        self.stream_id = show.stream_id
+
+class WeeklyIndex:
+    """In-memory index of every show's weekly airtime for fast overlap checks.
+
+    Intervals are kept in one list sorted by start minute; a query only looks
+    at intervals starting between (query start - longest interval) and the
+    query end.
+    """
+
+    def __init__(self):
+        self._intervals = []
+        self._shows = {}
+        self._max_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._shows)
+
+    def copy(self):
+        """Return an independent copy, e.g. to validate a batch before committing it."""
+
+        other = WeeklyIndex()
+        with self._lock:
+            other._intervals = list(self._intervals)
+            other._shows = dict(self._shows)
+            other._max_length = self._max_length
+        return other
+
+    def add(self, show):
+        """Add or replace a show in the index."""
+
+        snapshot = show if isinstance(show, ShowSnapshot) else ShowSnapshot(show)
+        with self._lock:
+            self._remove(snapshot.id)
+            self._shows[snapshot.id] = snapshot
+            for start, end in weekly_intervals(snapshot):
+                insort(self._intervals, (start, end, snapshot.id))
+                self._max_length = max(self._max_length, end - start)
+
+    def remove(self, show_id):
+        with self._lock:
+            self._remove(show_id)
+
+    def clear(self):
+        with self._lock:
+            self._intervals = []
+            self._shows = {}
+            self._max_length = 0
+
+    def _remove(self, show_id):
+        snapshot = self._shows.pop(show_id, None)
+        if snapshot is None:
+            return
+        for start, end in weekly_intervals(snapshot):
+            position = bisect_left(self._intervals, (start, end, show_id))
+            if position < len(self._intervals) and self._intervals[position] == (start, end, show_id):
+                del self._intervals[position]
+
+    def conflicts(self, show, exclude_id=None):
+        """Return the indexed shows on the same stream whose airtime and date range overlap ``show``."""
+
+        found = {}
+        with self._lock:
+            for start, end in weekly_intervals(show):
+                position = bisect_left(self._intervals, (start - self._max_length,))
+                while position < len(self._intervals) and self._intervals[position][0] < end:
+                    other_start, other_end, other_id = self._intervals[position]
+                    position += 1
+                    if other_end <= start or other_id == exclude_id or other_id in found:
+                        continue
+                    other = self._shows[other_id]
+                    if other.stream_id == show.stream_id and _dates_overlap(show, other):
+                        found[other_id] = other
+        return list(found.values())
+
+    def report(self):
+        """Return every pair of overlapping shows as JSON-ready dicts."""
+
+        with self._lock:
+            shows = list(self._shows.values())
+        pairs = []
+        for show in shows:
+            for other in self.conflicts(show, exclude_id=show.id):
+                if show.id < other.id:
+                    pairs.append({'shows': [_describe(show), _describe(other)]})
+        return pairs
+
+def get_index():
+    """Return the shared index, rebuilding it from the Show table if the shows changed elsewhere.
+
+    Changes this process commits are applied in place by ``apply_committed``;
+    anything else that moves ``data_version('shows')`` (other workers, expiry
+    on the leader) triggers a full rebuild.
+    """
+
+    global _index, _index_version
+    # A session of its own sees only committed shows, not the caller's
+    # pending changes; the version is read first so a commit racing the
+    # rebuild at worst causes another one.
+    with Session(db.engine) as session:
+        version = data_version('shows', session)
+        with _index_lock:
+            if _index is None or _index_version != version:
+                index = WeeklyIndex()
+                for show in session.scalars(select(Show)):
+                    index.add(show)
+                _index = index
+                _index_version = version
+            return _index
+
+def apply_committed(change):
+    """Apply a change to the shows this session just committed by calling ``change`` with the index.
+
+    The index stays current if it was current before the commit; otherwise
+    it is left for ``get_index`` to rebuild.
+    """
+
+    global _index_version
+    versions = committed_version('shows')
+    with _index_lock:
+        if _index is None or versions is None or _index_version != versions[0]:
+            return
+        change(_index)
+        _index_version = versions[1]
+
+def discard_show(show_id):
+    """Drop a show this session just deleted from the index."""
+
+    apply_committed(lambda index: index.remove(show_id))
+
+def validate_show(show, exclude_id=None, index=None):
+    """Check a show's time window against ``index`` (the shared index by default).
+
+    Returns ``(errors, warnings)`` as lists of messages. Overlaps with other
+    shows are errors unless ALLOW_SHOW_CONFLICTS is set.
+    """
+
+    errors, warnings = [], []
+    if show.end_time == show.start_time:
+        errors.append("End time cannot be the same as start time!")
+        return errors, warnings
+    if show.end_time < show.start_time:
+        warnings.append("Show runs past midnight and ends the next day.")
+
+    conflicts = (index if index is not None else get_index()).conflicts(show, exclude_id=exclude_id)
+    if conflicts:
+        message = "Show overlaps " + ", ".join(
+            f"{other.host} ({other.start_time.strftime('%H:%M')}-{other.end_time.strftime('%H:%M')})" for other in conflicts
+        ) + "."
+        (warnings if current_app.config['ALLOW_SHOW_CONFLICTS'] else errors).append(message)
+    return errors, warnings
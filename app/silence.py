@@ -0,0 +1,245 @@
+from collections import deque, namedtuple
+from datetime import datetime, timedelta
+from .logger import init_logger
+from . import stream_tap, metrics
+import threading
+import ffmpeg
+import queue
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SAMPLE_RATE = 8000
+WINDOW_SECONDS = 0.5
+WINDOWS_PER_READ = 4
+HISTORY_WINDOWS = 1200
+QUEUE_CHUNKS = 64
+EVENT_HISTORY = 100
+SPAN_HISTORY = 500
+
+Event = namedtuple('Event', ['time', 'kind', 'url', 'since', 'seconds'])
+
+settings = {'enabled': False, 'rms_db': -50.0, 'peak_db': -30.0, 'min_seconds': 30}
+events = deque(maxlen=EVENT_HISTORY)
+logger = None
+
+_detectors = {}
+_watchers = {}
+_lock = threading.Lock()
+
+def init_silence(app):
+    """Load dead air detection settings from the app config.
+
+    Detection listens on the stream tap, so it stays off when captures run
+    in ffmpeg mode rather than open a second connection to each stream.
+    """
+
+    global logger
+    logger = init_logger(name=__name__)
+    logger.info("Silence detection logger initialized.")
+
+    settings.update(
+        enabled=app.config['SILENCE_DETECTION_ENABLED'],
+        rms_db=app.config['SILENCE_RMS_DB'],
+        peak_db=app.config['SILENCE_PEAK_DB'],
+        min_seconds=app.config['SILENCE_MIN_SECONDS'],
+    )
+    if settings['enabled'] and np is None:
+        settings['enabled'] = False
+        logger.warning("NumPy is not installed, dead air detection disabled.")
+    if settings['enabled'] and not app.config['STREAM_TAP_ENABLED']:
+        settings['enabled'] = False
+        logger.warning("Dead air detection needs the stream tap (STREAM_TAP_ENABLED), disabled.")
+
+def watch(url):
+    """Analyze ``url`` until a matching ``unwatch``, sharing one detector per stream."""
+
+    if not settings['enabled']:
+        return None
+    with _lock:
+        _watchers[url] = _watchers.get(url, 0) + 1
+        detector = _detectors.get(url)
+        if detector is None:
+            detector = _detectors[url] = SilenceDetector(url)
+            stream_tap.get_tap(url).attach(detector)
+        return detector
+
+def unwatch(url):
+    """Release a ``watch``; the detector stops once nothing is watching its stream."""
+
+    with _lock:
+        if url not in _watchers:
+            return
+        _watchers[url] -= 1
+        if _watchers[url] > 0:
+            return
+        del _watchers[url]
+        detector = _detectors.pop(url)
+    stream_tap.get_tap(url).detach(detector)
+
+def spans(url, start, end):
+    """Return the dead air on ``url`` between ``start`` and ``end`` as clipped (start, end) pairs."""
+
+    with _lock:
+        detector = _detectors.get(url)
+    if detector is None:
+        return []
+    return detector.spans_between(start, end)
+
+def status():
+    """Current dead air per analyzed stream, and the most recent events."""
+
+    with _lock:
+        detectors = list(_detectors.values())
+    return {
+        'enabled': settings['enabled'],
+        'streams': [detector.to_dict() for detector in detectors],
+        'events': [
+            {'time': e.time.isoformat(), 'kind': e.kind, 'url': e.url, 'since': e.since.isoformat(), 'seconds': e.seconds}
+            for e in reversed(events)
+        ],
+    }
+
+def _emit(kind, url, since, now):
+    seconds = round((now - since).total_seconds(), 1)
+    events.append(Event(now, kind, url, since, seconds))
+    if kind == 'dead_air':
+        metrics.increment('dead_air', url)
+        logger.warning(f"Dead air on {url} since {since:%H:%M:%S}.", extra={'duration': seconds})
+    else:
+        logger.info(f"Audio back on {url} after {seconds}s of dead air.", extra={'duration': seconds})
+
+class SilenceDetector:
+    """Tap sink that decodes the stream to 8 kHz mono PCM and tracks dead air.
+
+    Chunks are queued for an ffmpeg decoder without blocking the tap, and
+    dropped if the decoder falls behind. PCM is read back a few windows at a
+    time into a fixed buffer; RMS and peak level per window are computed
+    with NumPy and kept in a ring of the last HISTORY_WINDOWS windows. A run
+    of quiet windows lasting SILENCE_MIN_SECONDS raises a dead air event and
+    becomes a span once audio returns.
+    """
+
+    def __init__(self, url):
+        self.url = self.path = url
+        self.levels = np.full((HISTORY_WINDOWS, 2), -np.inf, dtype=np.float32)
+        self.windows = 0
+        self.dropped = 0
+        self.silent_since = None
+        self.alerted = False
+        self.spans = deque(maxlen=SPAN_HISTORY)
+        self._window_samples = int(SAMPLE_RATE * WINDOW_SECONDS)
+        self._chunks = queue.Queue(maxsize=QUEUE_CHUNKS)
+        self._lock = threading.Lock()
+        self._process = None
+        threading.Thread(target=self._decode, name=f"Silence {url}", daemon=True).start()
+
+    def write(self, chunk):
+        try:
+            self._chunks.put_nowait(chunk)
+        except queue.Full:
+            self.dropped += 1
+
+    def on_disconnect(self):
+        with self._lock:
+            self._end_silence(datetime.now())
+
+    def close(self):
+        try:
+            self._chunks.put_nowait(None)
+        except queue.Full:
+            if self._process is not None:
+                self._process.kill()
+
+    def _decode(self):
+        try:
+            self._process = (
+                ffmpeg
+                .input('pipe:', format='mp3')
+                .output('pipe:', format='s16le', ac=1, ar=SAMPLE_RATE)
+                .global_args('-loglevel', 'error')
+                .run_async(pipe_stdin=True, pipe_stdout=True)
+            )
+        except Exception as e:
+            logger.error(f"Error starting the silence decoder for {self.url}: {e}")
+            return
+        threading.Thread(target=self._feed, name=f"Silence feed {self.url}", daemon=True).start()
+
+        buffer = bytearray(self._window_samples * WINDOWS_PER_READ * 2)
+        view = memoryview(buffer)
+        filled = 0
+        while True:
+            read = self._process.stdout.readinto(view[filled:])
+            if not read:
+                break
+            filled += read
+            if filled == len(buffer):
+                self._analyze(buffer)
+                filled = 0
+        self._process.wait()
+
+    def _feed(self):
+        stdin = self._process.stdin
+        try:
+            for chunk in iter(self._chunks.get, None):
+                stdin.write(chunk)
+                stdin.flush()
+        except (BrokenPipeError, ValueError):
+            pass
+        finally:
+            try:
+                stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def _analyze(self, buffer):
+        now = datetime.now()
+        samples = np.frombuffer(buffer, dtype='<i2').reshape(-1, self._window_samples).astype(np.float32)
+        rms = np.sqrt(np.mean(np.square(samples), axis=1))
+        peak = np.max(np.abs(samples), axis=1)
+        levels = 20 * np.log10(np.maximum(np.stack([rms, peak], axis=1), 1.0) / 32768.0)
+        quiet = (levels[:, 0] < settings['rms_db']) & (levels[:, 1] < settings['peak_db'])
+
+        count = len(levels)
+        with self._lock:
+            self.levels[(self.windows + np.arange(count)) % HISTORY_WINDOWS] = levels
+            self.windows += count
+            for index, is_quiet in enumerate(quiet.tolist()):
+                window_start = now - timedelta(seconds=(count - index) * WINDOW_SECONDS)
+                if not is_quiet:
+                    self._end_silence(window_start)
+                    continue
+                if self.silent_since is None:
+                    self.silent_since = window_start
+                window_end = window_start + timedelta(seconds=WINDOW_SECONDS)
+                if not self.alerted and (window_end - self.silent_since).total_seconds() >= settings['min_seconds']:
+                    self.alerted = True
+                    _emit('dead_air', self.url, self.silent_since, window_end)
+
+    def _end_silence(self, at):
+        if self.alerted:
+            self.spans.append((self.silent_since, at))
+            _emit('dead_air_ended', self.url, self.silent_since, at)
+        self.silent_since = None
+        self.alerted = False
+
+    def spans_between(self, start, end):
+        with self._lock:
+            found = list(self.spans)
+            if self.alerted:
+                found.append((self.silent_since, datetime.now()))
+        return [(max(s, start), min(e, end)) for s, e in found if s < end and e > start]
+
+    def to_dict(self):
+        with self._lock:
+            latest = self.levels[(self.windows - 1) % HISTORY_WINDOWS] if self.windows else None
+            return {
+                'url': self.url,
+                'dead_air_since': self.silent_since.isoformat() if self.alerted else None,
+                'rms_db': round(float(latest[0]), 1) if latest is not None else None,
+                'peak_db': round(float(latest[1]), 1) if latest is not None else None,
+                'windows': self.windows,
+                'dropped_chunks': self.dropped,
+            }
@@ -0,0 +1,211 @@
+from urllib.request import Request, urlopen
+from .logger import init_logger
+from datetime import datetime
+from .mp3 import iter_frames
+import threading
+import time
+
+_taps = {}
+_taps_lock = threading.Lock()
+MIN_GAP_SECONDS = 1.0
+
+settings = {'enabled': False, 'chunk_size': 16384, 'timeout': 10, 'reconnect_delay': 1, 'reconnect_max_delay': 30}
+logger = None
+
+def init_stream_tap(app):
+    """Load stream tap settings from the app config."""
+
+    global logger
+    logger = init_logger(name=__name__)
+    logger.info("Stream tap logger initialized.")
+
+    settings.update(
+        enabled=app.config['STREAM_TAP_ENABLED'],
+        chunk_size=app.config['STREAM_TAP_CHUNK_SIZE'],
+        timeout=app.config['STREAM_TAP_TIMEOUT'],
+        reconnect_max_delay=app.config['STREAM_RECONNECT_MAX_DELAY'],
+    )
+
+class FileSink:
+    """Writes whole MP3 frames from the tap into numbered part files.
+
+    Every upstream disconnect closes the current part; the next frame that
+    arrives opens a new one, and the time in between is kept in ``gaps``.
+    With a ``start`` and ``end`` only frames that aired in between are
+    written, each dated back from its chunk's arrival by the length of the
+    frames after it, so a sink attached early starts on the frame airing at
+    ``start``. ``start_offset`` is how far that frame's start was from it,
+    in seconds.
+    """
+
+    def __init__(self, path, start=None, end=None):
+        self.path = path
+        self.parts = []
+        self.gaps = []
+        self.bytes_written = 0
+        self.start_offset = None
+        self.disconnected_at = datetime.now()
+        self._start = start.timestamp() if start is not None else None
+        self._end = end.timestamp() if end is not None else None
+        self._file = None
+        self._pending = b''
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _open_part(self):
+        part = f"{self.path}.part{len(self.parts):03d}"
+        self.parts.append(part)
+        self._file = open(part, 'wb')
+        now = datetime.now()
+        if (now - self.disconnected_at).total_seconds() >= MIN_GAP_SECONDS and self.bytes_written:
+            self.gaps.append((self.disconnected_at, now))
+        self.disconnected_at = None
+
+    def write(self, chunk):
+        arrived = time.time()
+        with self._lock:
+            if self._closed:
+                return
+            data = self._pending + chunk
+            frames = list(iter_frames(data))
+            consumed = frames[-1][0] + frames[-1][1].length if frames else 0
+            self._pending = data[consumed:][-65536:]
+            if self._start is not None or self._end is not None:
+                frames = self._in_window(frames, arrived)
+            for offset, header in frames:
+                if self._file is None:
+                    self._open_part()
+                self._file.write(data[offset:offset + header.length])
+                self.bytes_written += header.length
+
+    def _in_window(self, frames, arrived):
+        """Keep the frames whose midpoint aired within the window; the last frame ends at ``arrived``."""
+
+        kept = []
+        ends_at = arrived
+        for offset, header in reversed(frames):
+            length = header.samples / header.sample_rate
+            middle = ends_at - length / 2
+            ends_at -= length
+            if (self._start is None or middle >= self._start) and (self._end is None or middle < self._end):
+                kept.append((offset, header))
+                if self._start is not None:
+                    self.start_offset = ends_at - self._start
+        kept.reverse()
+        if kept and self._start is not None:
+            self._start = None
+        return kept
+
+    def on_disconnect(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._pending = b''
+            if self.disconnected_at is None:
+                self.disconnected_at = datetime.now()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._file is not None:
+                self._file.close()
+
+class StreamTap:
+    """One upstream connection to a stream URL, copied into every attached sink.
+
+    The connection is opened by a reader thread when the first sink attaches
+    and closed once the last sink detaches.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.connects = 0
+        self.bytes_read = 0
+        self.connected = False
+        self._received = False
+        self._sinks = ()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def sink_count(self):
+        return len(self._sinks)
+
+    def attach(self, sink):
+        """Start copying stream data into ``sink``, connecting if needed."""
+
+        with self._lock:
+            self._sinks = self._sinks + (sink,)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"StreamTap {self.url}", daemon=True)
+                self._thread.start()
+        return sink
+
+    def detach(self, sink):
+        """Stop copying into ``sink`` and close it."""
+
+        with self._lock:
+            self._sinks = tuple(s for s in self._sinks if s is not sink)
+        sink.close()
+
+    def _run(self):
+        delay = settings['reconnect_delay']
+        while True:
+            with self._lock:
+                if not self._sinks:
+                    self._thread = None
+                    return
+            try:
+                self._pump()
+            except Exception as e:
+                if self._received:
+                    delay = settings['reconnect_delay']
+                self.connected = False
+                for sink in self._sinks:
+                    on_disconnect = getattr(sink, 'on_disconnect', None)
+                    if on_disconnect is not None:
+                        on_disconnect()
+                logger.error(f"Stream tap error on {self.url}: {e}. Reconnecting in {delay}s.")
+                time.sleep(delay)
+                delay = min(delay * 2, settings['reconnect_max_delay'])
+            finally:
+                self.connected = False
+
+    def _pump(self):
+        """Read from upstream until EOF, a stall, or no sinks remain.
+
+        A read that blocks longer than the configured timeout counts as a
+        stall and raises.
+        """
+
+        request = Request(self.url, headers={'User-Agent': 'ShowRecorder'})
+        self._received = False
+        with urlopen(request, timeout=settings['timeout']) as response:
+            self.connected = True
+            self.connects += 1
+            logger.info(f"Stream tap connected to {self.url}.")
+
+            while self._sinks:
+                chunk = response.read1(settings['chunk_size'])
+                if not chunk:
+                    raise EOFError("upstream closed the connection")
+                self._received = True
+                self.bytes_read += len(chunk)
+                for sink in self._sinks:
+                    try:
+                        sink.write(chunk)
+                    except Exception as e:
+                        logger.error(f"Error writing to {sink.path}: {e}")
+                        self.detach(sink)
+
+        logger.info(f"Stream tap disconnected from {self.url}, no sinks attached.")
+
+def get_tap(url):
+    """Return the shared tap for ``url``, creating it on first use."""
+
+    with _taps_lock:
+        tap = _taps.get(url)
+        if tap is None:
+            tap = _taps[url] = StreamTap(url)
+        return tap
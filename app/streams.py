@@ -0,0 +1,184 @@
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import select
+from .models import db, Show, Stream
+from .database import data_version
+from .logger import init_logger
+from . import stream_tap, config_store
+import threading
+
+DEFAULT_NAME = 'Default'
+DOWN_AFTER_FAILURES = 3
+# An active capture receiving less than this share of the stream's nominal
+# bitrate marks the stream degraded.
+MIN_RATE_RATIO = 0.5
+
+logger = None
+default = None
+
+_streams = {}
+_version = None
+_lock = threading.Lock()
+
+def init_streams(app):
+    """Set up the default stream from STREAM_URL."""
+
+    global logger, default
+    logger = init_logger(name=__name__)
+    logger.info("Streams logger initialized.")
+
+    if default is None:
+        default = StreamState(None, DEFAULT_NAME, app.config['STREAM_URL'], None, app.config['STREAM_MAX_CONCURRENT'])
+
+class StreamState:
+    """Connection state, health and concurrency limit of one mount, kept across captures.
+
+    Captures hold one of ``max_concurrent`` slots while they run; None means
+    only the recorder-wide limit applies. ``failures`` counts consecutive
+    failed captures and resets on the next good one.
+    """
+
+    def __init__(self, stream_id, name, url, bitrate, max_concurrent):
+        self.id = stream_id
+        self.active = 0
+        self.captures = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_success = None
+        self._lock = threading.Lock()
+        self.update(name, url, bitrate, max_concurrent)
+
+    def update(self, name, url, bitrate, max_concurrent):
+        """Apply edited settings; captures already holding a slot keep it."""
+
+        if url != getattr(self, 'url', url):
+            logger.info(f"Stream {name} moved to {url}.")
+        if max_concurrent != getattr(self, 'max_concurrent', None) or not hasattr(self, 'slots'):
+            self.slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+        self.name = name
+        self.url = url
+        self.bitrate = bitrate
+        self.max_concurrent = max_concurrent
+
+    @contextmanager
+    def slot(self):
+        """Hold one of this stream's capture slots, waiting for a free one."""
+
+        slots = self.slots
+        if slots is not None:
+            slots.acquire()
+        with self._lock:
+            self.active += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self.active -= 1
+            if slots is not None:
+                slots.release()
+
+    def record(self, recording):
+        """Update the health counters with a finished capture."""
+
+        with self._lock:
+            self.captures += 1
+            if recording.state != 'finished' or not recording.bytes_written:
+                self.failures += 1
+                self.last_error = recording.error
+            else:
+                self.failures = 0
+                self.last_success = recording.finished_at or datetime.now()
+
+    @property
+    def tap(self):
+        with stream_tap._taps_lock:
+            return stream_tap._taps.get(self.url)
+
+    def health(self, captures=()):
+        """'down' after repeated failures, 'degraded' while disconnected, failing or slow, else 'ok'.
+
+        ``captures`` are this stream's active recordings, checked against the
+        nominal bitrate when one is set.
+        """
+
+        if self.failures >= DOWN_AFTER_FAILURES:
+            return 'down'
+        tap = self.tap
+        if self.failures or (tap is not None and tap.sink_count and not tap.connected):
+            return 'degraded'
+        if self.bitrate:
+            expected = self.bitrate * 1000 / 8 * MIN_RATE_RATIO
+            for capture in captures:
+                if capture.elapsed > 10 and capture.bytes_written / capture.elapsed < expected:
+                    return 'degraded'
+        return 'ok'
+
+    def to_dict(self, captures=()):
+        tap = self.tap
+        return {
+            'id': self.id,
+            'name': self.name,
+            'url': self.url,
+            'bitrate': self.bitrate,
+            'max_concurrent': self.max_concurrent,
+            'active': self.active,
+            'health': self.health(captures),
+            'connected': tap.connected if tap is not None else None,
+            'connects': tap.connects if tap is not None else 0,
+            'captures': self.captures,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'last_success': self.last_success.isoformat() if self.last_success else None,
+        }
+
+def reload():
+    """Pick up streams added, edited or removed in any process since the last call.
+
+    Costs one indexed lookup when nothing changed, so it runs before every
+    capture: a changed URL reaches the next recording without touching any
+    scheduler job.
+    """
+
+    global _version
+    version = data_version('streams')
+    if version == _version:
+        return
+    rows = Stream.query.all()
+    with _lock:
+        for row in rows:
+            state = _streams.get(row.id)
+            if state is None:
+                _streams[row.id] = StreamState(row.id, row.name, row.url, row.bitrate, row.max_concurrent)
+            else:
+                state.update(row.name, row.url, row.bitrate, row.max_concurrent)
+        for stream_id in set(_streams) - {row.id for row in rows}:
+            del _streams[stream_id]
+        _version = version
+    logger.info(f"Loaded {len(rows)} streams, version {version}.")
+
+def for_show(show_id):
+    """Return the StreamState a show records from, the default stream if it has none.
+
+    Needs an app context.
+    """
+
+    reload()
+    default.update(default.name, config_store.store.get('STREAM_URL', default.url), None, default.max_concurrent)
+    stream_id = db.session.execute(select(Show.stream_id).where(Show.id == show_id)).scalar() if show_id is not None else None
+    with _lock:
+        return _streams.get(stream_id, default)
+
+def all_streams():
+    """The default stream followed by every configured stream."""
+
+    with _lock:
+        return [default] + sorted(_streams.values(), key=lambda state: state.name)
+
+def status(captures=()):
+    """Every stream's state, with ``captures`` (active recordings) checked against their stream."""
+
+    reload()
+    return [
+        state.to_dict([capture for capture in captures if capture.stream is state])
+        for state in all_streams() if state is not None
+    ]
@@ -0,0 +1,168 @@
+from apscheduler.events import EVENT_JOB_ADDED, EVENT_JOB_REMOVED, EVENT_JOB_MODIFIED, EVENT_ALL_JOBS_REMOVED
+from collections import namedtuple
+from datetime import datetime, timedelta
+from heapq import merge
+from itertools import islice, takewhile
+from .logger import init_logger
+from .models import Show
+from . import scheduler as schedule, config_store
+import threading
+import time
+
+logger = None
+
+Occurrence = namedtuple('Occurrence', 'start end show_id host duration output_file paused')
+
+settings = {'days': 7, 'limit': 200}
+
+CACHE_SECONDS = 60
+
+_version = 0
+_cache = {}
+_pause = None
+_cache_lock = threading.Lock()
+
+def init_timeline(app):
+    """Configure the timeline and invalidate its cache whenever a job changes."""
+
+    global logger
+    logger = init_logger(name=__name__)
+    logger.info("Timeline logger initialized.")
+
+    settings['days'] = app.config['TIMELINE_DAYS']
+    settings['limit'] = app.config['TIMELINE_MAX_OCCURRENCES']
+    config_store.store.subscribe(_on_config_change)
+    schedule.scheduler.add_listener(
+        _on_job_event, EVENT_JOB_ADDED | EVENT_JOB_REMOVED | EVENT_JOB_MODIFIED | EVENT_ALL_JOBS_REMOVED
+    )
+
+def _on_job_event(event):
+    invalidate()
+
+def _on_config_change(changes):
+    if 'PAUSE_SHOWS_RECORDING' in changes or 'PAUSE_SHOW_END_DATE' in changes:
+        invalidate()
+
+def invalidate():
+    """Drop every cached timeline; the next request recomputes it."""
+
+    global _version, _pause
+    with _cache_lock:
+        _version += 1
+        _cache.clear()
+        _pause = None
+
+def _fire_times(job):
+    """Yield a recording job's fire times in order, starting at its next run."""
+
+    fire_time = job.next_run_time
+    while fire_time is not None:
+        yield fire_time
+        fire_time = job.trigger.get_next_fire_time(fire_time, fire_time + timedelta(microseconds=1))
+
+def _job_occurrences(job):
+    # Jobs stored by older versions may lack the trailing show ID.
+    duration, output_file = job.args[1], job.args[2]
+    show_id = job.args[5] if len(job.args) > 5 else schedule.show_id_from_job(job.id)
+    for start in _fire_times(job):
+        yield start, show_id, duration, output_file
+
+def _pause_state():
+    """Return (paused, resume time or None), kept in memory until invalidated or CACHE_SECONDS pass."""
+
+    global _pause
+    config_store.store.refresh()
+    now = time.monotonic()
+    with _cache_lock:
+        if _pause is not None and now < _pause[0]:
+            return _pause[1]
+        version = _version
+    state = _read_pause_state()
+    with _cache_lock:
+        if version == _version:
+            _pause = (now + CACHE_SECONDS, state)
+    return state
+
+def _read_pause_state():
+    """Read (paused, resume time or None) from the user config and the resume job."""
+
+    if config_store.store.get('PAUSE_SHOWS_RECORDING') is not True:
+        return False, None
+    resume_job = schedule.scheduler.get_job(schedule.RESUME_JOB_ID)
+    return True, resume_job.next_run_time if resume_job else None
+
+def _compute(days, limit, pause):
+    """Merge the fire times of all recording jobs into the next ``limit`` occurrences."""
+
+    now = datetime.now(schedule.scheduler.timezone)
+    horizon = now + timedelta(days=days)
+    paused, resume_at = pause
+
+    streams = [
+        _job_occurrences(job) for job in schedule.scheduler.get_jobs()
+        if job.id.startswith(schedule.RECORD_JOB_PREFIX) and job.next_run_time is not None
+    ]
+    merged = merge(*streams, key=lambda item: item[0])
+    upcoming = list(islice(takewhile(lambda item: item[0] < horizon, merged), limit))
+
+    hosts = {}
+    show_ids = {item[1] for item in upcoming}
+    if show_ids:
+        query = Show.query.with_entities(Show.id, Show.host_first_name, Show.host_last_name)
+        hosts = {row.id: f"{row.host_first_name} {row.host_last_name}" for row in query.filter(Show.id.in_(show_ids))}
+
+    occurrences = []
+    for start, show_id, duration, output_file in upcoming:
+        occurrences.append(Occurrence(
+            start=start,
+            end=start + timedelta(seconds=duration),
+            show_id=show_id,
+            host=hosts.get(show_id, ''),
+            duration=duration,
+            output_file=schedule.recording_path(output_file, start),
+            paused=paused and (resume_at is None or start < resume_at)
+        ))
+    return occurrences
+
+def upcoming(days=None, limit=None):
+    """Return the next recordings within ``days`` days, at most ``limit`` of them.
+
+    Results are cached until a job is added, changed or removed, the pause
+    state changes, the first cached occurrence starts, or CACHE_SECONDS pass.
+    """
+
+    days = min(days or settings['days'], settings['days'])
+    limit = min(limit or settings['limit'], settings['limit'])
+    pause = _pause_state()
+    key = (days, limit, pause)
+    now = datetime.now(schedule.scheduler.timezone)
+
+    with _cache_lock:
+        version = _version
+        cached = _cache.get(key)
+    if cached is not None and now < cached[0]:
+        return cached[1]
+
+    started = datetime.now()
+    occurrences = _compute(days, limit, pause)
+    logger.info(f"Timeline of {len(occurrences)} occurrences computed in "
+                f"{(datetime.now() - started).total_seconds() * 1000:.1f} ms.")
+
+    expires = now + timedelta(seconds=CACHE_SECONDS)
+    if occurrences:
+        expires = min(expires, occurrences[0].start)
+    with _cache_lock:
+        if version == _version:
+            _cache[key] = (expires, occurrences)
+    return occurrences
+
+def to_dict(occurrence):
+    return {
+        'show_id': occurrence.show_id,
+        'host': occurrence.host,
+        'start': occurrence.start.isoformat(),
+        'end': occurrence.end.isoformat(),
+        'duration': occurrence.duration,
+        'output_file': occurrence.output_file,
+        'paused': occurrence.paused,
+    }
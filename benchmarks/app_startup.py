@@ -0,0 +1,110 @@
+"""Benchmark create_app() against large show tables.
+
+Each start runs in a fresh process against the same instance folder. The
+cold start sees a database from an older version: no schema version, no
+persisted jobs, and a batch of expired shows to purge. The warm start
+follows it with everything already in place:
+
+    python -m benchmarks.app_startup --shows 2000 --expired 2000
+"""
+
+from datetime import date, time, timedelta
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time as clock
+
+DAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+
+def config_for(workdir, fast):
+    from config import Config
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        OUTPUT_FOLDER = os.path.join(workdir, 'recordings')
+        AUTO_CREATE_SHOW_FOLDERS = False
+        POSTPROCESS_STEPS = []
+        FAST_STARTUP = fast
+    return BenchConfig
+
+def seed(workdir, shows, expired):
+    """Create the database with ``shows`` current and ``expired`` past weekly shows."""
+
+    from flask import Flask
+    from app.models import db, Show
+
+    os.makedirs(os.path.join(workdir, 'recordings'), exist_ok=True)
+    app = Flask('app', instance_path=workdir)
+    app.config.from_object(config_for(workdir, True))
+    db.init_app(app)
+
+    today = date.today()
+    with app.app_context():
+        db.create_all()
+        for count, start, end in ((shows, today, today + timedelta(days=120)), (expired, today - timedelta(days=200), today - timedelta(days=1))):
+            db.session.add_all(
+                Show(
+                    host_first_name=f"Host{i}", host_last_name="Bench",
+                    start_date=start, end_date=end,
+                    start_time=time(i % 24, (i * 7) % 60), end_time=time((i + 1) % 24, (i * 7) % 60),
+                    days_of_week=DAYS[i % 7],
+                )
+                for i in range(count)
+            )
+        db.session.commit()
+
+def run_phase(workdir, fast):
+    """Start the app once and print the elapsed times as JSON."""
+
+    started = clock.perf_counter()
+    from app import create_app
+    from app.scheduler import scheduler
+    from app import leader
+
+    app = create_app(config_for(workdir, fast), instance_path=workdir)
+    serving = clock.perf_counter() - started
+    while not (leader.is_leader and scheduler.state == 1):
+        clock.sleep(0.005)
+    while app.config['SCHEDULER_PERSISTENT_JOBS'] and not scheduler.get_jobs():
+        clock.sleep(0.005)
+    scheduling = clock.perf_counter() - started
+    print(json.dumps({'serving': serving, 'scheduling': scheduling, 'jobs': len(scheduler.get_jobs())}))
+    scheduler.shutdown(wait=False)
+
+def spawn(workdir, fast):
+    args = [sys.executable, '-m', 'benchmarks.app_startup', '--phase', 'start', '--workdir', workdir]
+    if not fast:
+        args.append('--slow')
+    output = subprocess.run(args, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shows', type=int, default=1000)
+    parser.add_argument('--expired', type=int, default=1000)
+    parser.add_argument('--phase', choices=['start'], help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    parser.add_argument('--slow', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        run_phase(args.workdir, not args.slow)
+        return
+
+    print(f"shows: {args.shows}, expired: {args.expired}")
+    for fast in (False, True):
+        with tempfile.TemporaryDirectory() as workdir:
+            seed(workdir, args.shows, args.expired)
+            cold = spawn(workdir, fast)
+            warm = spawn(workdir, fast)
+        mode = 'fast' if fast else 'inline'
+        for label, result in (('cold', cold), ('warm', warm)):
+            print(f"{mode:>6} {label}: serving after {result['serving'] * 1000:8.1f} ms, "
+                  f"scheduling after {result['scheduling'] * 1000:8.1f} ms ({result['jobs']} jobs)")
+
+if __name__ == '__main__':
+    main()
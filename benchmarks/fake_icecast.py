@@ -0,0 +1,142 @@
+"""A local stand-in for the station's Icecast mount.
+
+Serves synthetic MPEG-1 Layer III frames at a chosen bitrate, paced in real
+time (or ``speed`` times faster), and can inject network trouble: a slow
+connection setup, random jitter between chunks, stalls where nothing is
+sent, and disconnects after a set time. Run it on its own to point a dev instance at it:
+
+    python -m benchmarks.fake_icecast --port 8000 --bitrate 128 --jitter-ms 50 --drop-after 120
+"""
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import argparse
+import random
+import threading
+import time
+
+SAMPLE_RATE = 44100
+SAMPLES_PER_FRAME = 1152
+BITRATES = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
+CHUNK_SECONDS = 0.1
+
+def make_frame(bitrate_kbps):
+    """Return one 44.1 kHz MPEG-1 Layer III frame of silence-like filler at ``bitrate_kbps``."""
+
+    index = BITRATES.index(bitrate_kbps)
+    header = bytes([0xFF, 0xFB, index << 4, 0x00])
+    length = 144 * bitrate_kbps * 1000 // SAMPLE_RATE
+    return header + b'\x11' * (length - len(header))
+
+class Impairments:
+    """Network trouble to inject into every connection."""
+
+    def __init__(self, jitter=0.0, stall_every=None, stall_seconds=0.0, drop_after=None, seed=None, connect_delay=0.0):
+        self.connect_delay = connect_delay
+        self.jitter = jitter
+        self.stall_every = stall_every
+        self.stall_seconds = stall_seconds
+        self.drop_after = drop_after
+        self.random = random.Random(seed)
+
+class FakeIcecast(ThreadingHTTPServer):
+    """Threaded HTTP server streaming frames to every client that connects."""
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), bitrate=128, speed=1.0, impairments=None):
+        super().__init__(address, _StreamHandler)
+        self.frame = make_frame(bitrate)
+        self.bitrate = bitrate
+        self.speed = speed
+        self.impairments = impairments or Impairments()
+        self.connections = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/stream"
+
+    @property
+    def bytes_per_second(self):
+        """Bytes a client receives per wall-clock second."""
+
+        return len(self.frame) * SAMPLE_RATE / SAMPLES_PER_FRAME * self.speed
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="Fake Icecast", daemon=True).start()
+        return self
+
+    def _count(self, connections=0, sent=0):
+        with self._lock:
+            self.connections += connections
+            self.bytes_sent += sent
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        impairments = server.impairments
+        server._count(connections=1)
+        # Stands in for DNS, TLS and the player's initial buffer fill.
+        time.sleep(impairments.connect_delay)
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('icy-name', 'Fake Icecast')
+        self.end_headers()
+
+        frames_per_chunk = max(1, round(SAMPLE_RATE / SAMPLES_PER_FRAME * CHUNK_SECONDS * server.speed))
+        chunk = server.frame * frames_per_chunk
+        interval = frames_per_chunk * SAMPLES_PER_FRAME / SAMPLE_RATE / server.speed
+        started = next_send = time.monotonic()
+        next_stall = started + impairments.stall_every if impairments.stall_every else None
+
+        try:
+            # Join mid-frame, as a real listener connecting to a live mount does.
+            self.wfile.write(server.frame[len(server.frame) // 3:])
+            while True:
+                now = time.monotonic()
+                if impairments.drop_after and now - started >= impairments.drop_after:
+                    self.wfile.write(server.frame[:len(server.frame) // 2])
+                    return
+                if next_stall is not None and now >= next_stall:
+                    time.sleep(impairments.stall_seconds)
+                    next_stall = time.monotonic() + impairments.stall_every
+                    next_send = time.monotonic()
+                self.wfile.write(chunk)
+                server._count(sent=len(chunk))
+                next_send += interval
+                delay = next_send - time.monotonic()
+                if impairments.jitter:
+                    delay += impairments.random.uniform(0, impairments.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--bitrate', type=int, default=128, choices=BITRATES[1:])
+    parser.add_argument('--speed', type=float, default=1.0)
+    parser.add_argument('--connect-delay-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--stall-every', type=float, help="seconds between stalls")
+    parser.add_argument('--stall-seconds', type=float, default=5)
+    parser.add_argument('--drop-after', type=float, help="seconds before each connection is dropped")
+    args = parser.parse_args()
+
+    server = FakeIcecast(
+        (args.host, args.port), args.bitrate, args.speed,
+        Impairments(args.jitter_ms / 1000, args.stall_every, args.stall_seconds, args.drop_after,
+                    connect_delay=args.connect_delay_ms / 1000)
+    )
+    print(f"Serving {args.bitrate} kbps at {server.url}")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
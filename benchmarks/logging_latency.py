@@ -0,0 +1,92 @@
+"""Benchmark how long capture threads spend inside logging calls.
+
+Several threads log like capture threads do while the file handler is
+made artificially slow (a sleep every few records, plus frequent
+rollovers). The same load runs against a synchronous RotatingFileHandler
+and against the app's queue-based pipeline:
+
+    python -m benchmarks.logging_latency --threads 8 --messages 500 --stall-ms 20
+"""
+
+from logging.handlers import RotatingFileHandler
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time as clock
+
+class SlowHandler(RotatingFileHandler):
+    """A rotating file handler that stalls every ``every`` records, like a busy disk."""
+
+    def __init__(self, path, stall, every):
+        super().__init__(path, maxBytes=64 * 1024, backupCount=3)
+        self.stall = stall
+        self.every = every
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+        if self.count % self.every == 0:
+            clock.sleep(self.stall)
+        super().emit(record)
+
+def run_load(logger, threads, messages):
+    """Log ``messages`` records from each of ``threads`` threads, returning per-call latencies."""
+
+    latencies = []
+    lock = threading.Lock()
+
+    def capture(index):
+        local = []
+        for i in range(messages):
+            started = clock.perf_counter()
+            logger.info(f"Capture {index} wrote chunk {i}.",
+                        extra={'recording_id': index, 'show_id': index, 'file': f"show_{index}.mp3"})
+            local.append(clock.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=capture, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return latencies
+
+def summarize(label, latencies):
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:>12}: p50 {statistics.median(latencies) * 1e6:9.1f} us  "
+          f"p99 {p99 * 1e6:9.1f} us  max {latencies[-1] * 1000:8.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--stall-ms', type=float, default=20)
+    parser.add_argument('--every', type=int, default=50)
+    args = parser.parse_args()
+
+    from app import logger as app_logger
+
+    stall = args.stall_ms / 1000
+    with tempfile.TemporaryDirectory() as workdir:
+        direct = logging.getLogger('bench.direct')
+        direct.propagate = False
+        direct.setLevel(logging.INFO)
+        direct.addHandler(SlowHandler(os.path.join(workdir, 'direct.log'), stall, args.every))
+        summarize('synchronous', run_load(direct, args.threads, args.messages))
+
+        logger = app_logger.init_logger(os.path.join(workdir, 'ShowRecorder.log'), name='capture')
+        app_logger._listener.handlers = (SlowHandler(os.path.join(workdir, 'queued.log'), stall, args.every),)
+        app_logger.configure_logging({'LOG_FORMAT': 'json'})
+        summarize('queued', run_load(logger, args.threads, args.messages))
+
+        started = clock.perf_counter()
+        app_logger.shutdown_logging()
+        print(f"queue drained {clock.perf_counter() - started:.2f}s after the capture threads finished")
+
+if __name__ == '__main__':
+    main()
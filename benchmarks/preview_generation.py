@@ -0,0 +1,94 @@
+"""Benchmark waveform and loudness preview generation on long recordings.
+
+By default synthetic float32 PCM (a tone over noise) of each requested
+length is streamed straight into the analysis pass, so the NumPy side is
+measured without ffmpeg. Peak traced memory should stay flat as the
+length grows. With ``--file`` a real recording is decoded through ffmpeg
+as the app does, optionally several at once through the worker pool:
+
+    python -m benchmarks.preview_generation --hours 1 2 4
+    python -m benchmarks.preview_generation --file long_RAWDATA.mp3 --copies 4 --workers 2
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time as clock
+import tracemalloc
+
+import numpy as np
+
+from app import preview
+
+class SyntheticPCM:
+    """File-like source of ``seconds`` of stereo float32 PCM, generated one second at a time."""
+
+    def __init__(self, seconds, sample_rate):
+        t = np.arange(sample_rate) / sample_rate
+        tone = 0.2 * np.sin(2 * np.pi * 440 * t) + 0.02 * np.random.default_rng(1).standard_normal(sample_rate)
+        self.second = np.stack([tone, tone], axis=1).astype('<f4').tobytes()
+        self.remaining = seconds * len(self.second)
+        self.offset = 0
+
+    def readinto(self, view):
+        size = min(len(view), self.remaining, len(self.second) - self.offset)
+        view[:size] = self.second[self.offset:self.offset + size]
+        self.offset = (self.offset + size) % len(self.second)
+        self.remaining -= size
+        return size
+
+def bench_synthetic(hours, sample_rate, points):
+    for length in hours:
+        seconds = int(length * 3600)
+        tracemalloc.start()
+        started = clock.perf_counter()
+        peaks, loudness, duration = preview.analyze(SyntheticPCM(seconds, sample_rate), sample_rate, 2, seconds * sample_rate, points)
+        elapsed = clock.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{length:g} h: {elapsed:.1f} s ({duration / elapsed:.0f}x real time), {len(peaks)} points, "
+              f"loudness {loudness:.1f} LUFS, peak traced memory {peak / 2**20:.1f} MiB")
+
+def bench_files(path, copies, workers):
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = []
+        for i in range(copies):
+            paths.append(os.path.join(workdir, f"copy{i}_{os.path.basename(path)}"))
+            shutil.copyfile(path, paths[-1])
+
+        preview.settings['enabled'] = True
+        preview.logger = preview.init_logger(name=preview.__name__)
+        generator = preview.PreviewGenerator(workers)
+        started = clock.perf_counter()
+        for copy in paths:
+            generator.submit(copy)
+        generator._pool.shutdown(wait=True)
+        elapsed = clock.perf_counter() - started
+
+        generated = [preview.load(copy) for copy in paths]
+        audio = sum(p.duration for p in generated if p is not None)
+        print(f"{len([p for p in generated if p])}/{copies} previews with {workers} workers in {elapsed:.1f} s "
+              f"({audio / elapsed:.0f}x real time overall)")
+        if generated[0] is not None:
+            print(f"sidecar {os.path.getsize(preview.sidecar_path(paths[0]))} bytes, "
+                  f"loudness {generated[0].loudness} LUFS, {generated[0].duration:.0f} s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hours', type=float, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--sample-rate', type=int, default=preview.settings['sample_rate'])
+    parser.add_argument('--points', type=int, default=preview.settings['points'])
+    parser.add_argument('--file', help="decode this recording through ffmpeg instead of synthetic PCM")
+    parser.add_argument('--copies', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=preview.settings['workers'])
+    args = parser.parse_args()
+
+    preview.settings.update(sample_rate=args.sample_rate, points=args.points)
+    if args.file:
+        bench_files(args.file, args.copies, args.workers)
+    else:
+        bench_synthetic(args.hours, args.sample_rate, args.points)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Load-test the recorder against a local fake Icecast mount.
+
+N shows are created and scheduled through the real schedule_recording()
+-> record_stream() path, with time compressed: each show lasts a few
+seconds instead of hours, and its job is pulled forward to fire a moment
+after setup, with its warm-up job ``--warmup`` seconds before that. The
+report covers the measured offset of each recording's first frame from its
+scheduled start (tap mode only), bytes captured against the stream's
+bitrate, and CPU time and memory per capture. A second phase times
+refresh_schedule() on a large show table:
+
+    python -m benchmarks.recorder_load --shows 8 --duration 10 --jitter-ms 30 --drop-after 4
+    python -m benchmarks.recorder_load --shows 8 --lead 5 --warmup 0 --connect-delay-ms 800
+    python -m benchmarks.recorder_load --shows 0 --refresh-shows 10000
+"""
+
+from datetime import date, datetime, timedelta
+import argparse
+import os
+import resource
+import statistics
+import tempfile
+import time as clock
+
+from benchmarks.fake_icecast import FakeIcecast, Impairments
+
+DAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+def config_for(workdir, stream_url, mode, warmup):
+    from config import Config
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        OUTPUT_FOLDER = os.path.join(workdir, 'recordings')
+        STREAM_URL = stream_url
+        STREAM_TAP_ENABLED = mode == 'tap'
+        AUTO_CREATE_SHOW_FOLDERS = False
+        POSTPROCESS_STEPS = []
+        FAST_STARTUP = False
+        SCHEDULER_LEADER_ELECTION = False
+        ALLOW_SHOW_CONFLICTS = True
+        RECORDER_MAX_CONCURRENT = 1000
+        RECORDING_WARMUP_SECONDS = warmup
+    return BenchConfig
+
+def rss_bytes():
+    """Current resident set size of this process, or None where /proc is unavailable."""
+
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return None
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+def run_captures(app, shows, duration, lead, warmup):
+    """Schedule ``shows`` shows of ``duration`` seconds starting ``lead`` seconds from now."""
+
+    from app.models import db, Show
+    from app.scheduler import scheduler, schedule_recording, record_job_id, warmup_job_id
+    from app import recorder
+
+    start = datetime.now().replace(microsecond=0) + timedelta(seconds=lead)
+    end = start + timedelta(seconds=duration)
+    with app.app_context():
+        created = [
+            Show(
+                host_first_name=f"Load{i}", host_last_name="Bench",
+                start_date=start.date(), end_date=start.date() + timedelta(days=1),
+                start_time=start.time(), end_time=end.time(),
+                days_of_week=DAYS[start.weekday()],
+            )
+            for i in range(shows)
+        ]
+        db.session.add_all(created)
+        db.session.commit()
+        for show in created:
+            schedule_recording(show)
+            # Cron triggers only have minute resolution; fire at the compressed start instead.
+            scheduler.modify_job(record_job_id(show.id), next_run_time=start.astimezone(scheduler.timezone))
+            if warmup:
+                warm_at = max(start - timedelta(seconds=warmup), datetime.now())
+                scheduler.modify_job(warmup_job_id(show.id), next_run_time=warm_at.astimezone(scheduler.timezone))
+
+    rss_before, cpu_before = rss_bytes(), cpu_seconds()
+    peak_rss = rss_before or 0
+    deadline = end + timedelta(seconds=30)
+    while datetime.now() < deadline:
+        clock.sleep(0.2)
+        peak_rss = max(peak_rss, rss_bytes() or 0)
+        if datetime.now() > end and len(recorder.manager.history()) >= shows and not recorder.manager.active():
+            break
+    cpu = cpu_seconds() - cpu_before
+    return [r for r in recorder.manager.history() if r.show_id is not None], cpu, rss_before, peak_rss
+
+def run_refresh(app, count):
+    """Time refresh_schedule() with ``count`` shows: first build, then a no-op reconcile."""
+
+    from app.models import db, Show
+    from app.scheduler import refresh_schedule
+
+    today = date.today()
+    with app.app_context():
+        db.session.add_all(
+            Show(
+                host_first_name=f"Host{i}", host_last_name="Bench",
+                start_date=today, end_date=today + timedelta(days=120),
+                start_time=datetime.min.replace(hour=i % 24, minute=(i * 7) % 60).time(),
+                end_time=datetime.min.replace(hour=(i + 1) % 24, minute=(i * 7) % 60).time(),
+                days_of_week=DAYS[i % 7],
+            )
+            for i in range(count)
+        )
+        db.session.commit()
+    return refresh_schedule(), refresh_schedule()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shows', type=int, default=8, help="concurrent shows to record")
+    parser.add_argument('--duration', type=float, default=10, help="seconds each show lasts")
+    parser.add_argument('--lead', type=float, default=3, help="seconds between setup and the shows starting")
+    parser.add_argument('--warmup', type=int, default=2, help="seconds the warm-up jobs fire early, 0 to disable")
+    parser.add_argument('--mode', choices=['tap', 'ffmpeg'], default='tap')
+    parser.add_argument('--bitrate', type=int, default=128)
+    parser.add_argument('--speed', type=float, default=1.0, help="stream this many times faster than real time")
+    parser.add_argument('--connect-delay-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--stall-every', type=float)
+    parser.add_argument('--stall-seconds', type=float, default=2)
+    parser.add_argument('--drop-after', type=float)
+    parser.add_argument('--refresh-shows', type=int, default=0, help="also time refresh_schedule() with this many shows")
+    args = parser.parse_args()
+
+    server = FakeIcecast(
+        bitrate=args.bitrate, speed=args.speed,
+        impairments=Impairments(args.jitter_ms / 1000, args.stall_every, args.stall_seconds, args.drop_after, seed=1,
+                                connect_delay=args.connect_delay_ms / 1000)
+    ).start()
+
+    from app import create_app
+    from app.scheduler import scheduler
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, 'recordings'))
+        app = create_app(config_for(workdir, server.url, args.mode, args.warmup), instance_path=workdir)
+
+        if args.shows:
+            captures, cpu, rss_before, peak_rss = run_captures(app, args.shows, args.duration, args.lead, args.warmup)
+            expected = server.bytes_per_second * args.duration
+            offsets = [r.start_offset for r in captures if r.start_offset is not None]
+            ratios = [r.bytes_written / expected for r in captures]
+            failed = [r for r in captures if r.state != 'finished']
+
+            print(f"captures: {len(captures)}/{args.shows} ({len(failed)} failed), mode {args.mode}, "
+                  f"{args.duration:.0f}s at {args.bitrate} kbps x{args.speed}, {server.connections} upstream connections")
+            if offsets:
+                print(f"start offset: median {statistics.median(offsets) * 1000:+.0f} ms, "
+                      f"max |offset| {max(map(abs, offsets)) * 1000:.0f} ms (warm-up {args.warmup}s)")
+            if ratios:
+                print(f"bytes captured / expected: min {min(ratios):.3f}, median {statistics.median(ratios):.3f}, "
+                      f"gaps {sum(len(r.gaps) for r in captures)}")
+            print(f"cpu per capture: {cpu / args.shows * 1000:.1f} ms")
+            if rss_before:
+                print(f"rss: {rss_before / 2**20:.1f} MiB before, peak {peak_rss / 2**20:.1f} MiB, "
+                      f"{(peak_rss - rss_before) / args.shows / 1024:.0f} KiB per capture")
+            for r in failed:
+                print(f"  failed {r.output_file}: {r.error}")
+
+        if args.refresh_shows:
+            build, noop = run_refresh(app, args.refresh_shows)
+            print(f"refresh_schedule() with {args.refresh_shows} shows: build {build['duration_ms']:.0f} ms "
+                  f"({build['added']} added), no-op {noop['duration_ms']:.0f} ms ({noop['unchanged']} unchanged)")
+
+        scheduler.shutdown(wait=False)
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
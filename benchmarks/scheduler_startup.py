@@ -0,0 +1,106 @@
+"""Benchmark scheduler startup against a large show table.
+
+A cold start (empty job store, full schedule build) and a warm start (jobs
+already in the persistent job store) are each run in a fresh process:
+
+    python -m benchmarks.scheduler_startup --shows 2000
+"""
+
+from datetime import date, time, timedelta
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time as clock
+
+DAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+def make_app(workdir, persistent=True):
+    """Build a minimal app that uses ``workdir`` as its instance folder."""
+
+    from flask import Flask
+    from config import Config
+    from app.database import init_database
+    from app.logger import init_logger
+    from app.config_store import init_config_store
+
+    init_logger(os.path.join(workdir, 'ShowRecorder.log'))
+    app = Flask('app', instance_path=workdir)
+    app.config.from_object(Config)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        OUTPUT_FOLDER=os.path.join(workdir, 'recordings'),
+        SCHEDULER_PERSISTENT_JOBS=persistent,
+    )
+    init_database(app)
+    init_config_store(app, {"PAUSE_SHOWS_RECORDING": False, "PAUSE_SHOW_END_DATE": None})
+    return app
+
+def seed(workdir, count):
+    """Create the database and insert ``count`` weekly shows."""
+
+    from app.models import db, Show
+
+    app = make_app(workdir)
+    os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+
+    today = date.today()
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(
+            Show(
+                host_first_name=f"Host{i}", host_last_name="Bench",
+                start_date=today, end_date=today + timedelta(days=120),
+                start_time=time(i % 24, (i * 7) % 60), end_time=time((i + 1) % 24, (i * 7) % 60),
+                days_of_week=DAYS[i % 7],
+            )
+            for i in range(count)
+        )
+        db.session.commit()
+
+def run_phase(workdir, persistent):
+    """Start the scheduler once and print the elapsed time as JSON."""
+
+    from app.scheduler import init_scheduler, start_scheduling, scheduler
+
+    app = make_app(workdir, persistent)
+    started = clock.perf_counter()
+    init_scheduler(app)
+    start_scheduling(app)
+    elapsed = clock.perf_counter() - started
+    print(json.dumps({'seconds': elapsed, 'jobs': len(scheduler.get_jobs())}))
+    scheduler.shutdown(wait=False)
+
+def spawn(workdir, phase, persistent=True):
+    args = [sys.executable, '-m', 'benchmarks.scheduler_startup', '--phase', phase, '--workdir', workdir]
+    if not persistent:
+        args.append('--memory')
+    output = subprocess.run(args, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shows', type=int, default=1000)
+    parser.add_argument('--phase', choices=['start'], help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    parser.add_argument('--memory', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        run_phase(args.workdir, not args.memory)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        seed(workdir, args.shows)
+        memory = spawn(workdir, 'start', persistent=False)
+        cold = spawn(workdir, 'start')
+        warm = spawn(workdir, 'start')
+
+    print(f"shows: {args.shows}")
+    for label, result in (('in-memory rebuild', memory), ('persistent cold', cold), ('persistent warm', warm)):
+        print(f"{label:>18}: {result['seconds'] * 1000:8.1f} ms ({result['jobs']} jobs)")
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,12 @@ class Config:
     SECRET_KEY = "a_not_so_secure_fallback_key"
     SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(os.path.abspath(os.path.dirname(__file__)), "instance", "app.db")}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLITE_WAL = True
+    SQLITE_BUSY_TIMEOUT = 30
+    SQLITE_POOL_SIZE = 10
+    SQLITE_POOL_OVERFLOW = 20
     STREAM_URL = "https://wlmc.landmark.edu:8880/stream"
+    STREAM_MAX_CONCURRENT = None
     OUTPUT_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), "instance", "recordings")
     ADMIN_USERNAME = "admin"
     ADMIN_PASSWORD = "admin"
@@ -13,3 +18,56 @@ class Config:
     AUTO_CREATE_SHOW_FOLDERS = False
     PAUSE_SHOWS_RECORDING = False
     PAUSE_SHOW_END_DATE = None
+    SCHEDULER_PERSISTENT_JOBS = True
+    SCHEDULER_MISFIRE_GRACE_TIME = 60
+    SCHEDULER_COALESCE = True
+    SCHEDULER_LEADER_ELECTION = True
+    SCHEDULER_LEADER_RETRY_SECONDS = 2
+    SCHEDULER_CHANNEL_TIMEOUT = 10
+    FAST_STARTUP = True
+    RECORDING_LATE_START = True
+    RECORDING_WARMUP_SECONDS = 10
+    STREAM_TAP_ENABLED = True
+    STREAM_TAP_CHUNK_SIZE = 16384
+    STREAM_TAP_TIMEOUT = 10
+    ROLLING_BUFFER_ENABLED = False
+    ROLLING_BUFFER_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), "instance", "buffer")
+    ROLLING_BUFFER_SEGMENT_SECONDS = 60
+    ROLLING_BUFFER_RETENTION_HOURS = 24
+    ROLLING_BUFFER_MAX_BYTES = 4 * 1024 ** 3
+    RECORDER_MAX_CONCURRENT = 4
+    STREAM_RECONNECT_MAX_DELAY = 30
+    POSTPROCESS_STEPS = ['trim', 'tag']
+    POSTPROCESS_WORKERS = 2
+    POSTPROCESS_MAX_ATTEMPTS = 3
+    POSTPROCESS_LOUDNESS_TARGET = -16
+    POSTPROCESS_BITRATE = '128k'
+    POSTPROCESS_TRANSCODE_BITRATES = []
+    USE_X_SENDFILE = False
+    RETENTION_INTERVAL_MINUTES = 60
+    RETENTION_MAX_BYTES = None
+    RETENTION_MAX_AGE_DAYS = None
+    RETENTION_KEEP_LAST_PER_SHOW = None
+    RETENTION_ARCHIVE_FOLDER = None
+    RETENTION_ARCHIVE_BITRATE = '64k'
+    RETENTION_ARCHIVE_MAX_AGE_DAYS = None
+    MIN_FREE_BYTES = 1024 ** 3
+    ALLOW_SHOW_CONFLICTS = False
+    SILENCE_DETECTION_ENABLED = True
+    SILENCE_RMS_DB = -50
+    SILENCE_PEAK_DB = -30
+    SILENCE_MIN_SECONDS = 30
+    PREVIEW_ENABLED = True
+    PREVIEW_POINTS = 2000
+    PREVIEW_SAMPLE_RATE = 22050
+    PREVIEW_WORKERS = 2
+    PREVIEW_CACHE_SIZE = 256
+    TIMELINE_DAYS = 7
+    TIMELINE_MAX_OCCURRENCES = 500
+    METRICS_TOKEN = None
+    API_TOKEN = None
+    API_PAGE_SIZE = 100
+    API_MAX_PAGE_SIZE = 500
+    LOG_FORMAT = 'text'
+    LOG_LEVEL = 'INFO'
+    LOG_LEVELS = {}
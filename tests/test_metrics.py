@@ -0,0 +1,32 @@
+from apscheduler.events import EVENT_JOB_SUBMITTED
+from apscheduler.schedulers.background import BackgroundScheduler
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import threading
+
+from app import metrics, scheduler as schedule
+
+def tick():
+    pass
+
+def test_coalesced_runs_are_counted(monkeypatch, tmp_path):
+    scheduler = BackgroundScheduler(timezone=timezone.utc,
+                                    job_defaults={'coalesce': True, 'misfire_grace_time': None})
+    monkeypatch.setattr(schedule, 'scheduler', scheduler)
+    monkeypatch.setitem(metrics._counters, 'jobs_coalesced', {})
+    metrics.init_metrics(SimpleNamespace(config={'OUTPUT_FOLDER': str(tmp_path)}))
+
+    submitted = threading.Event()
+    scheduler.add_listener(lambda event: submitted.set(), EVENT_JOB_SUBMITTED)
+    scheduler.start(paused=True)
+    try:
+        # Six runs are overdue: 330, 270, 210, 150, 90 and 30 seconds ago.
+        now = datetime.now(timezone.utc)
+        scheduler.add_job(tick, 'interval', minutes=1, id='tick',
+                          next_run_time=now - timedelta(seconds=330))
+        scheduler.resume()
+        assert submitted.wait(5)
+    finally:
+        scheduler.shutdown()
+
+    assert metrics._counters['jobs_coalesced'] == {('tick',): 5}